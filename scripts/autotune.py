@@ -0,0 +1,299 @@
+TUNE_PAGESIZES = (100, 250, 500, 1000, 2000)
+TUNE_WORKERS = (1, 2, 4, 8)
+TUNE_PRICE_WORKERS = (4, 8, 16, 32)
+
+_TUNE_LOCK = threading.Lock()
+_TUNE_KEY_LOCKS = {}
+
+def _server_key():
+    """Clave del servidor en el archivo de ajustes: URL base + compañía."""
+    return f"{BASE}|{COMPANY}"
+
+def tuning_key(entity, select=None, expand=None):
+    """
+    Clave de una consulta en el archivo de ajustes: la entidad sola, o la entidad
+    más un hash de $select/$expand, porque el peso de la página depende de la
+    proyección (Items con select=ItemCode no pesa lo mismo que con el $expand de
+    bodegas). El $filter no entra: cambia cuántas filas hay, no cuánto pesa cada una.
+    """
+    if not select and not expand:
+        return entity
+    proj = hashlib.sha1(f"{select or ''}|{expand or ''}".encode("utf-8")).hexdigest()[:8]
+    return f"{entity}#{proj}"
+
+def load_tuning(path=None):
+    """
+    Lee el archivo de ajustes (TUNING_FILE) con los valores de todas las entidades
+    y servidores.
+
+    Returns
+    -------
+    dict
+        {"<BASE>|<COMPANY>": {"<entidad>": {"pagesize": ..., "workers": ..., ...}}}
+    """
+    path = path or TUNING_FILE
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        print(f"[WARN] No se pudo leer {path}; se ignoran los ajustes guardados")
+        return {}
+
+def save_entity_tuning(entity, settings, path=None):
+    """
+    Guarda los ajustes de una entidad (o clave de tuning_key) para el servidor
+    actual, conservando los del resto de entidades y servidores.
+
+    Leer, actualizar y reemplazar se hace bajo `<archivo>.lock` (FileLock), con un
+    temporal único en la misma carpeta, así los procesos que ajustan a la vez no
+    pierden entradas ni se pisan el temporal.
+    """
+    global TUNING
+    path = path or TUNING_FILE
+    folder = os.path.dirname(path) or "."
+    os.makedirs(folder, exist_ok=True)
+    with FileLock(path + ".lock"):
+        data = load_tuning(path)
+        data.setdefault(_server_key(), {})[entity] = settings
+        fd, tmp = tempfile.mkstemp(dir=folder, prefix=os.path.basename(path) + ".", suffix=".part")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, sort_keys=True)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+    TUNING = data
+
+def tuned_settings(session, entity, select=None, expand=None, where=None):
+    """
+    Devuelve el tamaño de página y la concurrencia a usar para una entidad.
+
+    Orden de preferencia:
+      1) Ajustes guardados en TUNING_FILE para este servidor, entidad y proyección
+         ($select/$expand, ver tuning_key).
+      2) Con SL_AUTOTUNE=true, se ejecuta tune_entity y se guarda el resultado. Los
+         hilos que piden la misma clave a la vez esperan al primero (se ajusta una
+         sola vez) y se relee el archivo por si otro proceso ya la ajustó.
+      3) Valores por defecto: PAGESIZE y workers=None (cada función usa el suyo).
+
+    Parameters
+    ----------
+    session : requests.Session
+        Sesión autenticada (sólo se usa si hay que ajustar).
+    entity : str
+        Entidad OData, ej. "Items".
+    select, expand, where : str, optional
+        Consulta con la que se ajustaría (el peso de la página depende de ella).
+
+    Returns
+    -------
+    dict
+        {"pagesize": int, "workers": int or None}
+    """
+    global TUNING
+    if TUNING is None:
+        TUNING = load_tuning()
+    key = tuning_key(entity, select, expand)
+    settings = TUNING.get(_server_key(), {}).get(key)
+    if settings is None and AUTOTUNE and session is not None:
+        with _TUNE_LOCK:
+            lock = _TUNE_KEY_LOCKS.setdefault(key, threading.Lock())
+        with lock:
+            TUNING = load_tuning()
+            settings = TUNING.get(_server_key(), {}).get(key)
+            if settings is None:
+                settings = tune_entity(session, entity, select=select, expand=expand, where=where)
+    if not settings:
+        return {"pagesize": PAGESIZE, "workers": None}
+    return {"pagesize": settings.get("pagesize") or PAGESIZE, "workers": settings.get("workers")}
+
+def _decoded_mb(raw):
+    """Memoria (MB) que ocupa una página una vez decodificada con json.loads."""
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    js = json.loads(raw)
+    used = tracemalloc.get_traced_memory()[0] - before
+    del js
+    if not was_tracing:
+        tracemalloc.stop()
+    return used / (1024 * 1024)
+
+def _probe_pages(session, base_url, pagesize, pages, workers):
+    """
+    Descarga las páginas 0..pages-1 por $skip con `workers` hilos.
+
+    Returns
+    -------
+    tuple[int, int, float]
+        (filas, bytes de payload, segundos)
+    """
+    headers = {"Prefer": f"odata.maxpagesize={pagesize}"}
+
+    def _fetch(k):
+        raw = req_get(session, f"{base_url}&$top={pagesize}&$skip={k * pagesize}", headers=headers).content
+        return len(json.loads(raw).get("value", [])), len(raw)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        results = list(ex.map(_fetch, range(pages)))
+    dt = time.perf_counter() - t0
+    return sum(r[0] for r in results), sum(r[1] for r in results), dt
+
+def tune_entity(session, entity, select=None, expand=None, where=None, pagesizes=TUNE_PAGESIZES,
+                workers=TUNE_WORKERS, probe_pages=4, memory_mb=None, save=True):
+    """
+    Prueba las primeras páginas de una entidad con distintos tamaños de página y
+    concurrencias, y elige la combinación con más filas/s bajo un techo de memoria.
+
+    - Por cada tamaño se pide primero una página sola: da el peso del payload, la
+      memoria decodificada (tracemalloc) y detecta si el servidor recorta la página
+      (B1S PageSize menor que odata.maxpagesize), en cuyo caso no se prueban tamaños mayores.
+    - Por cada concurrencia se descargan max(probe_pages, workers) páginas a la vez.
+    - Memoria estimada = workers * (payload + página decodificada); las combinaciones
+      que superan `memory_mb` se descartan.
+
+    Parameters
+    ----------
+    session : requests.Session
+        Sesión autenticada.
+    entity : str
+        Entidad OData, ej. "Items", "Invoices".
+    select, expand, where : str, optional
+        Consulta a probar ($select, $expand, $filter).
+    pagesizes : Iterable[int], optional
+        Tamaños de página a probar (ascendentes).
+    workers : Iterable[int], optional
+        Concurrencias a probar.
+    probe_pages : int, optional
+        Páginas mínimas por prueba.
+    memory_mb : float, optional
+        Techo de memoria en MB. Por defecto TUNE_MEMORY_MB (SL_TUNE_MEMORY_MB).
+    save : bool, optional
+        Si True, guarda el resultado en TUNING_FILE.
+
+    Returns
+    -------
+    dict
+        Ajuste elegido: pagesize, workers, rows_per_s, bytes_per_row, memory_mb,
+        server_max_pagesize (si el servidor recorta) y tuned_at. Se guarda bajo
+        tuning_key(entity, select, expand).
+    """
+    memory_mb = memory_mb if memory_mb is not None else TUNE_MEMORY_MB
+    qs = []
+    if select:
+        qs.append(f"$select={select}")
+    if expand:
+        qs.append(f"$expand={expand}")
+    if where:
+        qs.append(f"$filter={where}")
+    base_url = f"{BASE}/{entity}?" + "&".join(qs)
+
+    print(f"Ajustando {entity} (techo {memory_mb:.0f} MB)...")
+    trials, server_max = [], None
+    for ps in sorted(pagesizes):
+        r = req_get(session, f"{base_url}&$top={ps}&$skip=0", headers={"Prefer": f"odata.maxpagesize={ps}"})
+        raw = r.content
+        js = r.json()
+        n = len(js.get("value", []))
+        if n < ps and next_link_url(js):
+            server_max = n
+            print(f"  -> el servidor recorta las páginas a {n} filas; no se prueban tamaños mayores")
+            break
+        page_mb = len(raw) / (1024 * 1024) + _decoded_mb(raw)
+
+        for w in workers:
+            rows, nbytes, dt = _probe_pages(session, base_url, ps, max(probe_pages, w), w)
+            trial = {
+                "pagesize": ps,
+                "workers": w,
+                "rows_per_s": round(rows / dt, 1) if dt else 0.0,
+                "bytes_per_row": round(nbytes / rows, 1) if rows else 0.0,
+                "memory_mb": round(w * page_mb, 2),
+            }
+            trials.append(trial)
+            print(f"  pagesize={ps:>5} workers={w:>2}: {trial['rows_per_s']:>10,.0f} filas/s, "
+                  f"{trial['bytes_per_row']:>7,.0f} B/fila, ~{trial['memory_mb']:.1f} MB")
+
+        if n < ps:
+            # La entidad completa cabe en una página: tamaños mayores dan lo mismo
+            break
+
+    if not trials:
+        return {}
+
+    fitting = [t for t in trials if t["memory_mb"] <= memory_mb]
+    if fitting:
+        best = max(fitting, key=lambda t: t["rows_per_s"])
+    else:
+        print(f"[WARN] {entity}: ninguna combinación entra en {memory_mb:.0f} MB; se usa la de menor memoria")
+        best = min(trials, key=lambda t: t["memory_mb"])
+
+    best = dict(best, server_max_pagesize=server_max, tuned_at=time.strftime("%Y-%m-%dT%H:%M:%S"))
+    print(f"✅ {entity}: pagesize={best['pagesize']} workers={best['workers']} "
+          f"({best['rows_per_s']:,.0f} filas/s)")
+    if save:
+        save_entity_tuning(tuning_key(entity, select, expand), best)
+    return best
+
+def tune_price_workers(session, pricelist_no, sample=200, workers=TUNE_PRICE_WORKERS, save=True):
+    """
+    Ajusta la concurrencia de export_prices_csv (una llamada por ítem) midiendo
+    ítems/s de fetch_item_price sobre los primeros `sample` ItemCode.
+
+    El resultado se guarda bajo la clave "ItemPrices" y export_prices_csv lo usa
+    cuando no se le pasa max_workers.
+
+    Parameters
+    ----------
+    session : requests.Session
+        Sesión autenticada.
+    pricelist_no : int
+        Lista de precios con la que probar.
+    sample : int, optional
+        Ítems por prueba.
+    workers : Iterable[int], optional
+        Concurrencias a probar.
+    save : bool, optional
+        Si True, guarda el resultado en TUNING_FILE.
+
+    Returns
+    -------
+    dict
+        {"workers": int, "items_per_s": float, "tuned_at": str}
+    """
+    codes = [c for _, c in zip(range(sample), stream_items(session))]
+    if not codes:
+        return {}
+
+    best = None
+    size_session_pool(session, max(workers))
+    for w in workers:
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=w) as ex:
+            list(ex.map(lambda c: fetch_item_price(session, c, pricelist_no), codes))
+        rate = len(codes) / (time.perf_counter() - t0)
+        print(f"  workers={w:>2}: {rate:,.0f} ítems/s")
+        if best is None or rate > best["items_per_s"]:
+            best = {"workers": w, "items_per_s": round(rate, 1)}
+
+    best["tuned_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    print(f"✅ ItemPrices: workers={best['workers']} ({best['items_per_s']:,.0f} ítems/s)")
+    if save:
+        save_entity_tuning("ItemPrices", best)
+    return best
+
+def print_tuning():
+    """Imprime los ajustes guardados para el servidor actual."""
+    settings = load_tuning().get(_server_key(), {})
+    if not settings:
+        print(f"Sin ajustes guardados para {_server_key()} en {TUNING_FILE}")
+        return
+    print(f"Ajustes para {_server_key()} ({TUNING_FILE}):")
+    for entity, st in sorted(settings.items()):
+        print(f"  {entity:<20} pagesize={st.get('pagesize', '-')} workers={st.get('workers', '-')} "
+              f"({st.get('tuned_at', '')})")
@@ -0,0 +1,458 @@
+def _kind_of(v):
+    """Tipo de columna para un valor: bool, int, float, code (texto) u object."""
+    if isinstance(v, bool):
+        return "bool"
+    if isinstance(v, int):
+        return "int"
+    if isinstance(v, float):
+        return "float"
+    if isinstance(v, str):
+        return "code"
+    return "object"
+
+class Column:
+    """
+    Una columna de ColumnTable, guardada en un arreglo tipado.
+
+    Tipos (`kind`):
+      code    textos codificados por diccionario: array('i') de ids + lista de
+              valores únicos (ItemCode, CardCode, fechas, tYES/tNO...); -1 = None
+      int     array('q'); los None se marcan en una máscara que se crea sólo si aparecen
+      float   array('d'); None se guarda como NaN. Si llegan enteros mezclados, una
+              máscara (creada sólo entonces) recuerda cuáles eran int y se
+              devuelven como int, para escribir "1" y no "1.0" como sl_fetch
+      bool    array('b'); -1 = None
+      object  lista de Python (colecciones anidadas de $expand, tipos mezclados)
+
+    Si no se indica `kind`, se deduce del primer valor no nulo. Un int que recibe
+    un float pasa a float; cualquier otra mezcla pasa a object.
+    """
+
+    def __init__(self, name, kind=None):
+        self.name = name
+        self.kind = None
+        self._n = 0
+        self._valid = None
+        self._ints = None
+        if kind is not None:
+            self._init(kind, 0)
+
+    def _init(self, kind, nulls):
+        self.kind = kind
+        if kind == "code":
+            self.data = array("i", [-1]) * nulls
+            self.values = []
+            self._ids = {}
+        elif kind == "int":
+            self.data = array("q", [0]) * nulls
+            if nulls:
+                self._valid = bytearray(nulls)
+        elif kind == "float":
+            self.data = array("d", [float("nan")]) * nulls
+        elif kind == "bool":
+            self.data = array("b", [-1]) * nulls
+        else:
+            self.data = [None] * nulls
+
+    def _promote(self, kind):
+        old = list(self)
+        self._valid = None
+        self._ints = None
+        self._init(kind, 0)
+        self._n = 0
+        for v in old:
+            self.append(v)
+
+    def append(self, v):
+        if self.kind is None:
+            if v is None:
+                self._n += 1
+                return
+            self._init(_kind_of(v), self._n)
+
+        kind = self.kind
+        if v is None:
+            if kind == "int":
+                if self._valid is None:
+                    self._valid = bytearray(b"\x01") * self._n
+                self.data.append(0)
+                self._valid.append(0)
+            else:
+                self.data.append(self._null())
+                if self._ints is not None:
+                    self._ints.append(0)
+            self._n += 1
+            return
+
+        vk = _kind_of(v)
+        if vk != kind and kind != "object" and not (kind == "float" and vk == "int"):
+            self._promote("float" if kind == "int" and vk == "float" else "object")
+            return self.append(v)
+
+        if kind == "code":
+            i = self._ids.get(v)
+            if i is None:
+                i = self._ids[v] = len(self.values)
+                self.values.append(v)
+            self.data.append(i)
+        elif kind == "bool":
+            self.data.append(1 if v else 0)
+        elif kind == "float":
+            self.data.append(v)
+            if vk == "int" and self._ints is None:
+                self._ints = bytearray(self._n)
+            if self._ints is not None:
+                self._ints.append(1 if vk == "int" else 0)
+        else:
+            self.data.append(v)
+            if self._valid is not None:
+                self._valid.append(1)
+        self._n += 1
+
+    def _null(self):
+        return {"code": -1, "float": float("nan"), "bool": -1}.get(self.kind)
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, i):
+        kind = self.kind
+        if kind is None:
+            if not -self._n <= i < self._n:
+                raise IndexError(i)
+            return None
+        x = self.data[i]
+        if kind == "code":
+            return self.values[x] if x >= 0 else None
+        if kind == "int":
+            return None if self._valid is not None and not self._valid[i] else x
+        if kind == "float":
+            if x != x:
+                return None
+            return int(x) if self._ints is not None and self._ints[i] else x
+        if kind == "bool":
+            return None if x < 0 else bool(x)
+        return x
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield self[i]
+
+    def where(self, value=None, pred=None):
+        """
+        Índices de las filas iguales a `value` (o donde pred(valor) es verdadero).
+
+        La igualdad sobre columnas code compara ids enteros, sin tocar los textos;
+        con NumPy instalado se resuelve con un solo barrido vectorizado.
+        """
+        if pred is not None:
+            return [i for i, v in enumerate(self) if pred(v)]
+        if self.kind == "code":
+            key = self._ids.get(value)
+            if key is None:
+                return []
+        elif self.kind == "bool":
+            key = 1 if value else 0
+        elif self.kind in ("int", "float"):
+            key = value
+            if self._valid is not None:
+                return [i for i, v in enumerate(self) if v == value]
+        else:
+            return [i for i, v in enumerate(self) if v == value]
+        if np is not None:
+            return np.flatnonzero(self.to_numpy(raw=True, copy=False) == key).tolist()
+        return [i for i, x in enumerate(self.data) if x == key]
+
+    def nbytes(self):
+        """Memoria aproximada de la columna (arreglo + textos únicos / objetos)."""
+        if self.kind is None:
+            return 0
+        if self.kind == "object":
+            return sys.getsizeof(self.data) + sum(sys.getsizeof(v) for v in self.data)
+        n = self.data.buffer_info()[1] * self.data.itemsize
+        if self._valid is not None:
+            n += len(self._valid)
+        if self._ints is not None:
+            n += len(self._ints)
+        if self.kind == "code":
+            n += sys.getsizeof(self.values) + sys.getsizeof(self._ids) + sum(sys.getsizeof(v) for v in self.values)
+        return n
+
+    def to_numpy(self, raw=False, copy=True):
+        """
+        Arreglo NumPy de la columna.
+
+        Parameters
+        ----------
+        raw : bool, optional
+            True: devuelve los datos tal cual (ids para code, -1 en bool nulos).
+            False: valores; code como arreglo object, int con nulos como masked array.
+        copy : bool, optional
+            True (por defecto): arreglo independiente de la columna.
+            False: los arreglos numéricos son vistas sin copia del buffer interno;
+            mientras alguna vista siga viva la columna queda congelada (append
+            lanza BufferError al tener que agrandar el arreglo).
+        """
+        if np is None:
+            raise RuntimeError("NumPy no está instalado (pip install numpy)")
+        if self.kind is None:
+            return np.full(self._n, None, dtype=object)
+        if self.kind == "object":
+            return np.array(self.data + [None], dtype=object)[:-1]
+        data = np.frombuffer(self.data, dtype={"i": np.int32, "q": np.int64, "d": np.float64, "b": np.int8}[self.data.typecode])
+        if self.kind == "code" and not raw:
+            # el id -1 cae en el None agregado al final (la indexación ya copia)
+            return np.array(self.values + [None], dtype=object)[data]
+        if copy:
+            data = data.copy()
+        if raw:
+            return data
+        if self.kind == "int" and self._valid is not None:
+            return np.ma.masked_array(data, mask=np.frombuffer(self._valid, dtype=np.uint8) == 0)
+        return data
+
+    def to_arrow(self):
+        """Arreglo Arrow; las columnas code se convierten a DictionaryArray."""
+        if pa is None:
+            raise RuntimeError("pyarrow no está instalado (pip install pyarrow)")
+        if self.kind == "code":
+            ids = pa.array([x if x >= 0 else None for x in self.data], type=pa.int32())
+            return pa.DictionaryArray.from_arrays(ids, pa.array(self.values, type=pa.string()))
+        types = {"int": pa.int64(), "float": pa.float64(), "bool": pa.bool_()}
+        return pa.array(list(self), type=types.get(self.kind))
+
+class ColumnTable:
+    """
+    Resultado columnar de una entidad: una Column tipada por campo seleccionado.
+
+    Alternativa a la list[dict] de sl_fetch para cargar entidades grandes (Items,
+    BusinessPartners) y cruzarlas en memoria: los nombres de campo no se repiten
+    por fila, los códigos se guardan una sola vez (codificación por diccionario)
+    y los números van en arreglos sin boxing.
+
+    Tiene append(dict), así que se puede pasar como `into` a sl_fetch o a
+    cualquier bucle sobre stream_entity y se llena página a página.
+
+    Parameters
+    ----------
+    fields : list[str], optional
+        Campos a guardar. Por defecto las claves de la primera fila (sin las
+        anotaciones "odata.*" ni "@odata.*").
+    types : dict, optional
+        {campo: kind} para fijar el tipo de una columna (ver Column).
+
+    Examples
+    --------
+    >>> t = sl_fetch_columns(s, "Items", select="ItemCode,ItemName,ItemsGroupCode")
+    >>> t.get("A00001")["ItemName"]
+    >>> grupo = t.filter("ItemsGroupCode", 100)
+    >>> t.write_csv(out_path, table="OITM")
+    """
+
+    def __init__(self, fields=None, types=None):
+        self.types = types or {}
+        self.fields = None
+        self.columns = {}
+        self._index = {}
+        if fields:
+            self._set_fields(fields)
+
+    def _set_fields(self, fields):
+        self.fields = list(fields)
+        self.columns = {f: Column(f, self.types.get(f)) for f in self.fields}
+
+    def append(self, row):
+        if self.fields is None:
+            # sin anotaciones OData ("@odata.etag", "odata.metadata", "Campo@odata.navigationLink")
+            self._set_fields([k for k in row if not k.startswith("odata.") and "@" not in k])
+        for f, col in self.columns.items():
+            col.append(row.get(f))
+
+    def extend(self, rows):
+        for r in rows:
+            self.append(r)
+        return self
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, field):
+        return self.columns[field]
+
+    def row(self, i, fields=None):
+        """Fila `i` como dict (mismo formato que sl_fetch)."""
+        return {f: self.columns[f][i] for f in fields or self.fields}
+
+    def rows(self, fields=None):
+        """Itera las filas como dicts (para save_csv u otro código que espere list[dict])."""
+        for i in range(len(self)):
+            yield self.row(i, fields)
+
+    def tuples(self, fields=None):
+        """Itera las filas como listas en el orden de `fields` (para writerow de export_csv)."""
+        cols = [self.columns[f] for f in fields or self.fields]
+        for i in range(len(self)):
+            yield [c[i] for c in cols]
+
+    def where(self, field, value=None, pred=None):
+        """Índices de las filas que cumplen la condición sobre `field` (ver Column.where)."""
+        return self.columns[field].where(value, pred)
+
+    def take(self, indices):
+        """Nueva ColumnTable con las filas indicadas, en ese orden."""
+        out = ColumnTable(self.fields, {f: c.kind for f, c in self.columns.items()})
+        for f, col in self.columns.items():
+            dst = out.columns[f]
+            for i in indices:
+                dst.append(col[i])
+        return out
+
+    def filter(self, field, value=None, pred=None):
+        """take(where(...)): subconjunto de filas como nueva ColumnTable."""
+        return self.take(self.where(field, value, pred))
+
+    def build_index(self, field):
+        """Construye (o reconstruye) el índice {valor: fila} de `field`."""
+        self._index[field] = (len(self), {v: i for i, v in enumerate(self.columns[field])})
+        return self._index[field][1]
+
+    def get(self, key, field=None, default=None):
+        """
+        Fila (dict) cuyo `field` es `key`. Por defecto el primer campo (ItemCode,
+        CardCode...). El índice se arma en la primera consulta y se rehace si la
+        tabla creció.
+        """
+        field = field or self.fields[0]
+        n, idx = self._index.get(field, (None, None))
+        if n != len(self):
+            idx = self.build_index(field)
+        i = idx.get(key)
+        return default if i is None else self.row(i)
+
+    def nbytes(self):
+        """{campo: bytes aproximados} más la entrada "total"."""
+        out = {f: c.nbytes() for f, c in self.columns.items()}
+        out["total"] = sum(out.values())
+        return out
+
+    def to_numpy(self, copy=True):
+        """
+        {campo: arreglo NumPy} (ver Column.to_numpy).
+
+        Con copy=False los arreglos numéricos son vistas sin copia y la tabla
+        queda congelada (no admite append) mientras alguna siga viva.
+        """
+        return {f: c.to_numpy(copy=copy) for f, c in self.columns.items()}
+
+    def to_arrow(self):
+        """pyarrow.Table con una columna por campo."""
+        if pa is None:
+            raise RuntimeError("pyarrow no está instalado (pip install pyarrow)")
+        return pa.table({f: c.to_arrow() for f, c in self.columns.items()})
+
+    def write_csv(self, out_path, header=None, fields=None, table=None, **kwargs):
+        """
+        Escribe la tabla con export_csv (manifiesto incluido).
+
+        Parameters
+        ----------
+        out_path : str
+            Ruta del CSV.
+        header : list[str], optional
+            Encabezado del CSV. Por defecto `fields`.
+        fields : list[str], optional
+            Campos a escribir, en el orden del encabezado. Por defecto todos.
+        table : str, optional
+            Nombre lógico para el manifiesto.
+        **kwargs
+            Resto de argumentos de export_csv (expected, watermark...).
+
+        Returns
+        -------
+        int
+            Filas escritas.
+        """
+        fields = fields or self.fields
+        with export_csv(out_path, header or fields, table=table, **kwargs) as w:
+            for r in self.tuples(fields):
+                w.writerow(["" if v is None else v for v in r])
+        return w.rows
+
+def sl_fetch_columns(session, entity, select=None, expand=None, where=None, pagesize=None, types=None):
+    """
+    Igual que sl_fetch, pero devuelve un ColumnTable llenado página a página.
+
+    Con `select`, las columnas son esos campos en ese orden (más la propiedad
+    de `expand`, como columna object).
+
+    Parameters
+    ----------
+    session, entity, select, expand, where, pagesize
+        Ver sl_fetch.
+    types : dict, optional
+        {campo: kind} para fijar tipos de columna (ver Column).
+
+    Returns
+    -------
+    ColumnTable
+    """
+    fields = [f.strip() for f in select.split(",")] if select else None
+    if fields and expand:
+        fields += [expand.split("(", 1)[0].strip()]
+    table = ColumnTable(fields, types)
+    return sl_fetch(session, entity, select=select, expand=expand, where=where, pagesize=pagesize, into=table)
+
+def compare_fetch_memory(session, entity, select=None, **kwargs):
+    """
+    Descarga la misma entidad como list[dict] y como ColumnTable y compara la
+    memoria retenida por cada resultado (tracemalloc) y el pico durante la carga.
+
+    Descarga la entidad dos veces; usar con SL_TRAFFIC=replay para no repetir
+    el tráfico real.
+
+    Parameters
+    ----------
+    session : requests.Session
+        Sesión autenticada.
+    entity : str
+        Entidad OData.
+    select : str, optional
+        Campos ($select).
+    **kwargs
+        expand, where, pagesize (ver sl_fetch).
+
+    Returns
+    -------
+    dict
+        {"rows", "dicts_mb", "columns_mb", "dicts_peak_mb", "columns_peak_mb", "ratio"}; los
+        picos son None si ya había un tracemalloc activo (perfilado).
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+
+    def _measure(fn):
+        base = tracemalloc.get_traced_memory()[0]
+        if started:
+            # con un perfilado activo no se reinicia el pico (es el de la etapa)
+            tracemalloc.reset_peak()
+        result = fn()
+        current, peak = tracemalloc.get_traced_memory()
+        return result, (current - base) / 1e6, ((peak - base) / 1e6 if started else None)
+
+    try:
+        dicts, dicts_mb, dicts_peak = _measure(lambda: sl_fetch(session, entity, select=select, **kwargs))
+        rows = len(dicts)
+        del dicts
+        cols, cols_mb, cols_peak = _measure(lambda: sl_fetch_columns(session, entity, select=select, **kwargs))
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    out = {"rows": rows, "dicts_mb": dicts_mb, "columns_mb": cols_mb,
+           "dicts_peak_mb": dicts_peak, "columns_peak_mb": cols_peak,
+           "ratio": dicts_mb / cols_mb if cols_mb > 0 else 0.0}
+    peak = lambda v: "-" if v is None else f"{v:.1f}"
+    print(f"{entity}: {rows} filas | list[dict] {dicts_mb:.1f} MB (pico {peak(dicts_peak)}) | "
+          f"ColumnTable {cols_mb:.1f} MB (pico {peak(cols_peak)}) | {out['ratio']:.1f}x menos")
+    return out
@@ -30,9 +30,7 @@ def export_all_itemgroups_csv(session, out_path):
     t0, written = time.time(), 0
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
 
-    with open(out_path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["ItmsGrpCod", "ItmsGrpNam"])
+    with export_csv(out_path, ["ItmsGrpCod", "ItmsGrpNam"], table="OITB", expected=total) as w:
         for r in stream_entity(session, "ItemGroups",
                                select="Number,GroupName",
                                orderby="Number"):
@@ -73,9 +71,8 @@ def export_all_items_csv(session, out_path):
     t0 = time.time()
     written = 0
 
-    with open(out_path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["ItemCode", "ItemName", "ItmsGrpCod", "UpdateDate", "CreateDate"])
+    with export_csv(out_path, ["ItemCode", "ItemName", "ItmsGrpCod", "UpdateDate", "CreateDate"],
+                    table="OITM", expected=total_reportado, watermark="UpdateDate") as w:
 
         for row in stream_entity(session, "Items",
                                  select="ItemCode,ItemName,ItemsGroupCode,UpdateDate,CreateDate",
@@ -129,9 +126,7 @@ def export_all_salespersons_csv(session, out_path):
     t0, written = time.time(), 0
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
 
-    with open(out_path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["SlpCode", "SlpName"])
+    with export_csv(out_path, ["SlpCode", "SlpName"], table="OSLP", expected=total) as w:
 
         for r in stream_entity(session, "SalesPersons",
                                select="SalesEmployeeCode,SalesEmployeeName",
@@ -184,13 +179,11 @@ def export_all_bp_csv(session, out_path):
     t0 = time.time()
     written = 0
 
-    with open(out_path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow([
-            "CardCode", "CardName", "LicTradNum", "E_Mail",
-            "Phone1", "Cellular", "Address", "U_BirthDate",
-            "UpdateDate", "CreateDate",
-        ])
+    with export_csv(out_path, [
+        "CardCode", "CardName", "LicTradNum", "E_Mail",
+        "Phone1", "Cellular", "Address", "U_BirthDate",
+        "UpdateDate", "CreateDate",
+    ], table="OCRD", expected=total_reportado, watermark="UpdateDate") as w:
 
         for bp in stream_entity(
             session,
@@ -224,7 +217,7 @@ def sl_fetch_invoice_lines(session, base, doc_entry):
     """
     Recupera las líneas (DocumentLines) de una factura OINV de forma robusta.
 
-    Estrategia:
+    Estrategia (ver sl_fetch_document_lines):
       1) GET /Invoices(docEntry)/DocumentLines?$select=LineNum,ItemCode,ItemDescription,Quantity,UnitPrice,LineTotal
       2) GET /Invoices(docEntry)/DocumentLines  (sin $select)
       3) GET /Invoices(docEntry) y se extrae la key 'DocumentLines'.
@@ -244,29 +237,34 @@ def sl_fetch_invoice_lines(session, base, doc_entry):
         Lista de líneas de la factura. Cada dict contiene como mínimo LineNum, ItemCode,
         descripción, cantidad, precio y total de línea (dependiendo de la variante).
     """
-    # 1) Con $select (si el Service Layer lo soporta)
-    url1 = f"{base}/Invoices({doc_entry})/DocumentLines?$select=LineNum,ItemCode,ItemDescription,Quantity,UnitPrice,LineTotal"
-    r = session.get(url1, timeout=120, verify=False)
-    if r.ok:
-        val = r.json().get("value")
-        if isinstance(val, list):
-            return val
-
-    # 2) Sin $select
-    url2 = f"{base}/Invoices({doc_entry})/DocumentLines"
-    r = session.get(url2, timeout=120, verify=False)
-    if r.ok:
-        val = r.json().get("value")
-        if isinstance(val, list):
-            return val
-
-    # 3) Factura completa y lectura de DocumentLines
-    url3 = f"{base}/Invoices({doc_entry})"
-    r = session.get(url3, timeout=120, verify=False)
-    r.raise_for_status()
-    obj = r.json()
-    lines = obj.get("DocumentLines", [])
-    return lines
+    return sl_fetch_document_lines(session, base, "Invoices", doc_entry)
+
+OINV_HEADER = ["DocEntry", "DocNum", "CardCode", "SlpCode", "DocDate", "DocTotal", "VatSum"]
+OINV_SELECT = "DocEntry,DocNum,CardCode,SalesPersonCode,DocDate,DocTotal,VatSum"
+
+def oinv_row(o):
+    """
+    Convierte un encabezado de documento del Service Layer en una fila con layout OINV.
+
+    Parameters
+    ----------
+    o : dict
+        Registro devuelto por /Invoices (u otra entidad de documentos).
+
+    Returns
+    -------
+    list
+        Valores en el orden de OINV_HEADER.
+    """
+    return [
+        o.get("DocEntry", ""),
+        o.get("DocNum", ""),
+        o.get("CardCode", ""),
+        o.get("SalesPersonCode", ""),
+        o.get("DocDate", ""),
+        o.get("DocTotal", ""),
+        o.get("VatSum", ""),
+    ]
 
 def export_all_invoices_csv(session, out_path, where=None):
     """
@@ -297,52 +295,44 @@ def export_all_invoices_csv(session, out_path, where=None):
     list[dict]
         Lista de facturas recuperadas, con los mismos campos que se exportan.
     """
-    try:
-        total = service_count(session, "Invoices")
-    except Exception:
-        total = None
-
-    if total is not None:
-        print("Invoices reportadas:", total)
+    return export_document_headers_csv(session, "Invoices", out_path, where=where)
 
-    t0, written = time.time(), 0
-    invoices = []
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+INV1_HEADER = ["DocEntry", "LineNum", "ItemCode", "Dscription", "Quantity", "Price", "LineTotal"]
 
-    with open(out_path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["DocEntry", "DocNum", "CardCode", "SlpCode", "DocDate", "DocTotal", "VatSum"])
+def inv1_row(doc_entry, l):
+    """
+    Convierte una línea de documento (DocumentLines) en una fila con layout INV1.
 
-        for o in stream_entity(
-            session,
-            "Invoices",
-            select="DocEntry,DocNum,CardCode,SalesPersonCode,DocDate,DocTotal,VatSum",
-            orderby="DocEntry",
-            where=where,
-        ):
-            w.writerow([
-                o.get("DocEntry", ""),
-                o.get("DocNum", ""),
-                o.get("CardCode", ""),
-                o.get("SalesPersonCode", ""),
-                o.get("DocDate", ""),
-                o.get("DocTotal", ""),
-                o.get("VatSum", ""),
-            ])
-            invoices.append(o)
-            written += 1
+    Normaliza el precio (UnitPrice o Price) y la descripción (ItemDescription o Dscription)
+    según la variante devuelta por sl_fetch_invoice_lines.
 
-            if written % 2000 == 0:
-                print(f"  -> {written} encabezados OINV")
+    Parameters
+    ----------
+    doc_entry : int or str
+        DocEntry del documento al que pertenece la línea.
+    l : dict
+        Línea devuelta por el Service Layer.
 
-    print(f"✅ OINV: {written} filas -> {out_path} ({time.time()-t0:.1f}s)")
-    return invoices
+    Returns
+    -------
+    list
+        Valores en el orden de INV1_HEADER.
+    """
+    return [
+        doc_entry,
+        l.get("LineNum", ""),
+        l.get("ItemCode", ""),
+        l.get("ItemDescription", l.get("Dscription", "")),
+        l.get("Quantity", ""),
+        l.get("UnitPrice", l.get("Price", "")),
+        l.get("LineTotal", ""),
+    ]
 
 def export_all_invoice_lines_csv(session, invoices, out_path, progress_every=500):
     """
     Exporta las líneas de las facturas (INV1) a partir de una lista de encabezados OINV.
 
-    Para cada DocEntry:
+    Para cada DocEntry (ver export_document_lines_csv):
       - Llama a sl_fetch_invoice_lines para recuperar DocumentLines.
       - Normaliza el campo de precio (UnitPrice o Price).
       - Escribe una fila en CSV por cada línea de factura.
@@ -373,43 +363,5 @@ def export_all_invoice_lines_csv(session, invoices, out_path, progress_every=500
     int
         Número de líneas (rows) exportadas.
     """
-    t0, written_docs, written_lines = time.time(), 0, 0
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
-
-    with open(out_path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["DocEntry", "LineNum", "ItemCode", "Dscription", "Quantity", "Price", "LineTotal"])
-
-        for i, o in enumerate(invoices, 1):
-            de = o.get("DocEntry")
-            try:
-                lines = sl_fetch_invoice_lines(session, BASE, de)
-            except HTTPError as e:
-                print(f"[WARN] DocEntry {de} sin líneas ({e})")
-                lines = []
-            except Exception as e:
-                print(f"[WARN] DocEntry {de} error: {e}")
-                lines = []
-
-            for l in lines:
-                price = l.get("UnitPrice", l.get("Price", ""))
-                w.writerow([
-                    de,
-                    l.get("LineNum", ""),
-                    l.get("ItemCode", ""),
-                    l.get("ItemDescription", l.get("Dscription", "")),
-                    l.get("Quantity", ""),
-                    price,
-                    l.get("LineTotal", ""),
-                ])
-                written_lines += 1
-
-            written_docs += 1
-            if written_docs % progress_every == 0:
-                print(
-                    f"  -> líneas de {written_docs}/{len(invoices)} "
-                    f"facturas (acum {written_lines} líneas)"
-                )
-
-    print(f"✅ INV1: {written_lines} líneas de {written_docs} facturas -> {out_path} ({time.time()-t0:.1f}s)")
-    return written_lines
+    return export_document_lines_csv(session, "Invoices", invoices, out_path,
+                                     progress_every=progress_every)
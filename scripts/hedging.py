@@ -0,0 +1,289 @@
+def _percentile(values, p):
+    """Percentil p (0-100) por rango más cercano; None si no hay muestras."""
+    if not values:
+        return None
+    vals = sorted(values)
+    idx = min(len(vals) - 1, max(0, int(round(p / 100.0 * len(vals) + 0.5)) - 1))
+    return vals[idx]
+
+class LatencyTracker:
+    """
+    Ventana deslizante de latencias de GET para calcular el umbral de hedging.
+
+    Parameters
+    ----------
+    window : int, optional
+        Número de muestras recientes que se conservan.
+    percentile : float, optional
+        Percentil que dispara el hedge (ej. 95 -> p95).
+    min_samples : int, optional
+        Muestras mínimas antes de empezar a hacer hedging.
+    floor : float, optional
+        Umbral mínimo en segundos, para no duplicar llamadas muy rápidas.
+    """
+
+    def __init__(self, window=500, percentile=95, min_samples=20, floor=0.05):
+        self.samples = deque(maxlen=window)
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.floor = floor
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def threshold(self):
+        """Devuelve el umbral actual en segundos, o None si aún no hay suficientes muestras."""
+        with self._lock:
+            if len(self.samples) < self.min_samples:
+                return None
+            value = _percentile(list(self.samples), self.percentile)
+        return max(value, self.floor)
+
+def clone_session(session):
+    """
+    Crea una sesión nueva (con su propio pool de conexiones) que comparte cabeceras,
+    cookies (B1SESSION) y verificación TLS con `session`.
+
+    Parameters
+    ----------
+    session : requests.Session
+        Sesión autenticada de origen.
+
+    Returns
+    -------
+    requests.Session
+    """
+    s = make_session()
+    s.headers.update(session.headers)
+    s.cookies.update(session.cookies)
+    s.verify = session.verify
+    return s
+
+class Hedger:
+    """
+    Hedging de GETs para recortar la latencia de cola del Service Layer.
+
+    Cada GET se lanza en un hilo. Si no responde antes del percentil de latencia
+    observado (LatencyTracker), se envía un duplicado por otra sesión del pool y
+    gana la primera respuesta válida. El perdedor se cancela si aún no empezó;
+    si ya está en vuelo, su respuesta se cierra y se descarta al llegar (requests
+    no permite abortar una petición en curso).
+
+    La tasa de hedges se limita a `max_hedge_rate` del total de peticiones para
+    no duplicar carga sobre un servidor que ya está lento.
+
+    El umbral se mide desde que la primaria empieza a ejecutarse (no desde que se
+    encola), así el tiempo en cola no dispara hedges. Las primarias usan un pool
+    de hilos del tamaño de la concurrencia (POOL_SIZE, agrandado por
+    size_session_pool) y los duplicados uno aparte, para no quedar detrás de ellas.
+
+    Parameters
+    ----------
+    session : requests.Session
+        Sesión autenticada; se clona `pool_size` veces para los duplicados.
+    pool_size : int, optional
+        Sesiones adicionales para los duplicados.
+    percentile : float, optional
+        Percentil de latencia que dispara el hedge.
+    max_hedge_rate : float, optional
+        Fracción máxima de peticiones que pueden duplicarse (0.05 = 5 %).
+    max_workers : int, optional
+        Hilos para peticiones primarias. Por defecto POOL_SIZE (ver resize).
+    hedge_workers : int, optional
+        Hilos para los duplicados. Por defecto 2 por sesión del pool.
+    window, min_samples : int, optional
+        Ver LatencyTracker.
+    """
+
+    def __init__(self, session, pool_size=4, percentile=95, max_hedge_rate=0.05,
+                 max_workers=None, hedge_workers=None, window=500, min_samples=20):
+        self.sessions = [clone_session(session) for _ in range(pool_size)]
+        self.tracker = LatencyTracker(window=window, percentile=percentile, min_samples=min_samples)
+        self.max_hedge_rate = max_hedge_rate
+        self.max_workers = max_workers or POOL_SIZE
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="hedge")
+        self.hedge_executor = ThreadPoolExecutor(max_workers=hedge_workers or 2 * pool_size,
+                                                 thread_name_prefix="hedge-dup")
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.primary_latencies = deque(maxlen=10000)
+        self.effective_latencies = deque(maxlen=10000)
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def resize(self, workers):
+        """Agranda el pool de primarias a `workers` hilos (nunca lo achica)."""
+        with self._lock:
+            if workers <= self.max_workers:
+                return
+            old, self.max_workers = self.executor, workers
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hedge")
+        # Las tareas ya encoladas en el pool anterior terminan igual
+        old.shutdown(wait=False)
+
+    def _timed_get(self, session, url, kwargs, primary, started=None):
+        if started is not None:
+            started.set()
+        t0 = time.monotonic()
+        r = session.get(url, **kwargs)
+        dt = time.monotonic() - t0
+        self.tracker.record(dt)
+        if primary:
+            self.primary_latencies.append(dt)
+        return r
+
+    def _hedge_session(self):
+        with self._lock:
+            s = self.sessions[self._next % len(self.sessions)]
+            self._next += 1
+            return s
+
+    def _hedge_allowed(self):
+        with self._lock:
+            if self.hedges + 1 > self.max_hedge_rate * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    @staticmethod
+    def _discard(fut):
+        # Cierra la respuesta del perdedor cuando termine, para liberar la conexión
+        if fut.cancel():
+            return
+        fut.add_done_callback(lambda f: f.exception() is None and f.result().close())
+
+    def get(self, session, url, **kwargs):
+        """
+        GET con hedging. Misma firma que session.get (url + kwargs).
+
+        Returns
+        -------
+        requests.Response
+            La primera respuesta válida (sin excepción y status < 400). Si ninguna lo
+            es, la respuesta de error (preferentemente la de la primaria, para que
+            req_get aplique sus reintentos) o, si todas fallaron, se relanza la excepción.
+        """
+        with self._lock:
+            self.requests += 1
+        t0 = time.monotonic()
+        started = threading.Event()
+        with self._lock:
+            executor = self.executor
+        primary = executor.submit(self._timed_get, session, url, kwargs, True, started)
+
+        threshold = self.tracker.threshold()
+        if threshold is not None:
+            # El umbral corre desde que la primaria sale, no desde que se encoló
+            started.wait()
+            done, _ = wait([primary], timeout=threshold)
+            if not done and self._hedge_allowed():
+                backup = self.hedge_executor.submit(self._timed_get, self._hedge_session(), url, kwargs, False)
+                pending = {primary, backup}
+                first_error = fallback = None
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        if fut.exception() is not None:
+                            first_error = first_error or fut.exception()
+                            continue
+                        r = fut.result()
+                        if r.status_code >= 400:
+                            # Un 5xx/429 rápido no gana: se espera a la otra petición
+                            if fallback is None or fut is primary:
+                                if fallback is not None:
+                                    fallback.close()
+                                fallback = r
+                            else:
+                                r.close()
+                            continue
+                        if fallback is not None:
+                            fallback.close()
+                        for other in pending:
+                            self._discard(other)
+                        if fut is backup:
+                            with self._lock:
+                                self.hedge_wins += 1
+                        self.effective_latencies.append(time.monotonic() - t0)
+                        return r
+                if fallback is not None:
+                    self.effective_latencies.append(time.monotonic() - t0)
+                    return fallback
+                raise first_error
+
+        r = primary.result()
+        self.effective_latencies.append(time.monotonic() - t0)
+        return r
+
+    def stats(self):
+        """
+        Métricas de hedging.
+
+        Returns
+        -------
+        dict
+            requests, hedges, hedge_rate, hedge_wins, y p50/p99 de la latencia de la
+            petición primaria ("sin hedging") frente a la latencia efectiva ("con hedging").
+        """
+        prim, eff = list(self.primary_latencies), list(self.effective_latencies)
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_rate": self.hedges / self.requests if self.requests else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "p50_primary": _percentile(prim, 50),
+            "p99_primary": _percentile(prim, 99),
+            "p50_effective": _percentile(eff, 50),
+            "p99_effective": _percentile(eff, 99),
+            "threshold": self.tracker.threshold(),
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.hedge_executor.shutdown(wait=False)
+        for s in self.sessions:
+            s.close()
+
+def enable_hedging(session, **options):
+    """
+    Activa el hedging en req_get para todo el proceso.
+
+    Parameters
+    ----------
+    session : requests.Session
+        Sesión autenticada (se clona para los duplicados).
+    **options :
+        Parámetros de Hedger (pool_size, percentile, max_hedge_rate, ...).
+
+    Returns
+    -------
+    Hedger
+    """
+    global HEDGER
+    if HEDGER is not None:
+        HEDGER.close()
+    HEDGER = Hedger(session, **options)
+    return HEDGER
+
+def disable_hedging():
+    """Desactiva el hedging y libera las sesiones del pool."""
+    global HEDGER
+    if HEDGER is not None:
+        HEDGER.close()
+    HEDGER = None
+
+def print_hedge_stats():
+    """Imprime p50/p99 sin y con hedging, y la tasa de duplicados."""
+    if HEDGER is None:
+        return
+    st = HEDGER.stats()
+
+    def _ms(v):
+        return f"{v * 1000:.0f} ms" if v is not None else "-"
+
+    print(f"Hedging: {st['hedges']}/{st['requests']} duplicados ({st['hedge_rate']:.1%}), "
+          f"{st['hedge_wins']} ganados por el duplicado")
+    print(f"  p50 primaria {_ms(st['p50_primary'])} -> efectiva {_ms(st['p50_effective'])}")
+    print(f"  p99 primaria {_ms(st['p99_primary'])} -> efectiva {_ms(st['p99_effective'])}")
@@ -1,24 +1,171 @@
 import os
+import sys
 import csv
+import json
 import time
+import io
+import heapq
+import codecs
+import zlib
+import hashlib
 import tempfile
+import shutil
+import random
+import sqlite3
+import tracemalloc
+import cProfile
+import pstats
+import socket
+import threading
+import multiprocessing
+from array import array
+from collections import deque
+from datetime import date, timedelta
 import requests
 import urllib3
 from requests import HTTPError
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from urllib.parse import quote, urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+try:
+    import resource  # sólo Unix; en Windows no hay medición de pico de RSS
+except ImportError:
+    resource = None
+
+try:
+    import fcntl  # bloqueo de archivos entre procesos en Unix (FileLock)
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+try:
+    import numpy as np  # opcional: respaldo NumPy para ColumnTable
+except ImportError:
+    np = None
+
+try:
+    import pyarrow as pa  # opcional: conversión de ColumnTable a Arrow
+except ImportError:
+    pa = None
 
 BASE = os.environ.get("SAP_SL_BASE")
 COMPANY = os.environ.get("SAP_SL_COMPANY")
 USER = os.environ.get("SAP_SL_USER")
 PASS = os.environ.get("SAP_SL_PASS")
 
-VERIFY = False
+# Verificación TLS: SL_CA_BUNDLE=/ruta/ca.pem (CA propia del servidor) o VERIFY_SSL=true (CAs del sistema)
+VERIFY = os.environ.get("SL_CA_BUNDLE", "").strip() or \
+    os.environ.get("VERIFY_SSL", "false").strip().lower() == "true"
+if VERIFY is False:
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+# Transporte HTTP (ver transport.py): conexiones por host y compresión aceptada
+POOL_SIZE = int(os.environ.get("SL_POOL_SIZE", "16"))
+ACCEPT_ENCODING = os.environ.get("SL_ACCEPT_ENCODING", "gzip, deflate")
+
 PAGESIZE = 1000
 TMPDIR = tempfile.gettempdir()
 
+# "full": r.json() sobre la página completa; "stream": parseo incremental del array "value"
+PARSE_MODE = os.environ.get("SL_PARSE_MODE", "full").strip().lower()
+STREAM_CHUNK = 64 * 1024
+
+# Hedging de GETs (ver hedging.py): se activa con SL_HEDGE=true o enable_hedging(session)
+HEDGE_ENABLED = os.environ.get("SL_HEDGE", "false").strip().lower() == "true"
+HEDGER = None
+
+# Ajuste automático de tamaño de página y concurrencia por entidad (ver autotune.py)
+AUTOTUNE = os.environ.get("SL_AUTOTUNE", "false").strip().lower() == "true"
+TUNING_FILE = os.environ.get("SL_TUNING_FILE", os.path.join(TMPDIR, "sl_tuning.json"))
+TUNE_MEMORY_MB = float(os.environ.get("SL_TUNE_MEMORY_MB", "256"))
+TUNING = None
+
+# Perfilado por etapa (ver profiling.py): --profile[=etapa,...] o SL_PROFILE=all|stream_entity,export,...
+PROFILE = os.environ.get("SL_PROFILE", "").strip()
+for _arg in sys.argv[1:]:
+    if _arg == "--profile":
+        PROFILE = PROFILE or "all"
+    elif _arg.startswith("--profile="):
+        PROFILE = _arg.split("=", 1)[1]
+PROFILE_DIR = os.environ.get("SL_PROFILE_DIR", os.path.join(TMPDIR, "sl_profile"))
+PROFILE_TOP = 25
+PROFILE_TRACE_DEPTH = 1
+PROFILE_REPORT = []
+
+# Captura / reproducción del tráfico del Service Layer (ver traffic.py): SL_TRAFFIC=capture|replay
+TRAFFIC_MODE = os.environ.get("SL_TRAFFIC", "").strip().lower()
+TRAFFIC_DIR = os.environ.get("SL_TRAFFIC_DIR", os.path.join(TMPDIR, "sl_traffic"))
+TRAFFIC = None
+
+# Cache persistente de respuestas (ver response_cache.py): SL_CACHE=true
+CACHE_ENABLED = os.environ.get("SL_CACHE", "false").strip().lower() == "true"
+CACHE_DIR = os.environ.get("SL_CACHE_DIR", os.path.join(TMPDIR, "sl_cache"))
+CACHE_MAX_MB = float(os.environ.get("SL_CACHE_MAX_MB", "64"))
+RESPONSE_CACHE = None
+
+# Shards de salida: límite de filas y/o MB por archivo para los exportadores (0 = un solo archivo)
+SHARD_ROWS = int(os.environ.get("SL_SHARD_ROWS", "0") or 0)
+SHARD_BYTES = int(float(os.environ.get("SL_SHARD_MB", "0") or 0) * 1024 * 1024)
+
+# Store SQLite de consulta de precios/stock para el POS (ver lookup_store.py); vacío = no se genera
+LOOKUP_STORE = os.environ.get("SL_LOOKUP_STORE", "").strip()
+
+def peak_rss_mb():
+    """
+    Devuelve el pico de memoria residente (RSS) del proceso en MB.
+
+    Permite comparar SL_PARSE_MODE=full contra SL_PARSE_MODE=stream ejecutando
+    el mismo export en dos procesos distintos (el pico es por proceso).
+
+    Returns
+    -------
+    float or None
+        Pico de RSS en MB, o None si la plataforma no lo soporta (Windows).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+class FileLock:
+    """
+    Bloqueo exclusivo entre procesos (y entre hilos) sobre un archivo `.lock`
+    (flock en Unix, msvcrt en Windows).
+
+    Lo usan los archivos que varios exportadores actualizan con leer-modificar-
+    reemplazar: manifest.json, el archivo de ajustes y el store de consulta.
+
+    Examples
+    --------
+    >>> with FileLock(path + ".lock"):
+    ...     data = load(path); data.update(...); write(path, data)
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self._f = open(self.path, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self._f, fcntl.LOCK_EX)
+        else:
+            self._f.seek(0)
+            msvcrt.locking(self._f.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._f, fcntl.LOCK_UN)
+        else:
+            self._f.seek(0)
+            msvcrt.locking(self._f.fileno(), msvcrt.LK_UNLCK, 1)
+        self._f.close()
+        return False
+
 def sl_login():
     """
     Inicia sesión en SAP Business One Service Layer y devuelve
@@ -35,18 +182,20 @@ def sl_login():
     requests.Session
         Sesión autenticada contra el Service Layer. Lanza HTTPError en caso de fallo.
     """
-    s = requests.Session()
+    s = make_session()
     r = s.post(
         f"{BASE}/Login",
         json={"CompanyDB": COMPANY, "UserName": USER, "Password": PASS},
         timeout=60,
-        verify=False,   # En producción: configurar certificados y usar verify=True
+        verify=VERIFY,
     )
     try:
         r.raise_for_status()
     except HTTPError:
         print("ERROR en Login:", r.status_code, r.text[:1000])
         raise
+    if HEDGE_ENABLED:
+        enable_hedging(s)
     return s
 
 def login():
@@ -64,7 +213,7 @@ def login():
     requests.Session
         Sesión autenticada con cabeceras OData adecuadas para paginación masiva.
     """
-    s = requests.Session()
+    s = make_session()
     s.headers.update({
         "Prefer": f"odata.maxpagesize={PAGESIZE}",
         "OData-Version": "4.0",
@@ -78,12 +227,14 @@ def login():
         verify=VERIFY,
     )
     r.raise_for_status()
+    if HEDGE_ENABLED:
+        enable_hedging(s)
     return s
 
-def sl_fetch(session, entity, select=None, expand=None, where=None, pagesize=1000):
+def sl_fetch(session, entity, select=None, expand=None, where=None, pagesize=None, into=None):
     """
     Descarga una entidad completa desde el Service Layer usando paginación simple
-    basada en $top/$skip. Devuelve una lista en memoria.
+    basada en $top/$skip. Devuelve una lista en memoria (o llena `into`).
 
     Parameters
     ----------
@@ -98,14 +249,20 @@ def sl_fetch(session, entity, select=None, expand=None, where=None, pagesize=100
     where : str, optional
         Filtro OData para $filter, ej. "DocDate ge 2025-01-01".
     pagesize : int, optional
-        Tamaño de página usado en $top. Por defecto 1000.
+        Tamaño de página usado en $top y odata.maxpagesize. Por defecto el ajustado
+        para la entidad (tuned_settings) o PAGESIZE.
+    into : object, optional
+        Contenedor con método append(dict) que se llena página a página, ej. un
+        ColumnTable (ver sl_fetch_columns). Por defecto una lista nueva.
 
     Returns
     -------
-    list[dict]
-        Lista de registros devueltos por la entidad.
+    list[dict] or object
+        Lista de registros devueltos por la entidad, o `into` ya lleno.
     """
-    data, skip = [], 0
+    pagesize = pagesize or tuned_settings(session, entity, select=select, expand=expand, where=where)["pagesize"]
+    headers = {"Prefer": f"odata.maxpagesize={pagesize}"}
+    data, skip = ([] if into is None else into), 0
     while True:
         params = [f"$top={pagesize}", f"$skip={skip}"]
         if select:
@@ -116,17 +273,16 @@ def sl_fetch(session, entity, select=None, expand=None, where=None, pagesize=100
             params.append(f"$filter={where}")
         url = f"{BASE}/{entity}?" + "&".join(params)
 
-        r = session.get(url, timeout=120, verify=False)
-        if r.status_code >= 400:
-            print("ERROR", r.status_code, "en", entity, "=>", r.text[:1000])
-            r.raise_for_status()
-
-        chunk = r.json().get("value", [])
-        if not chunk:
-            break
+        n = 0
+        try:
+            for row in iter_page_rows(session, url, {}, headers=headers):
+                data.append(row)
+                n += 1
+        except HTTPError as e:
+            print("ERROR", e.response.status_code, "en", entity, "=>", e.response.text[:1000])
+            raise
 
-        data.extend(chunk)
-        if len(chunk) < pagesize:
+        if n < pagesize:
             break
 
         skip += pagesize
@@ -0,0 +1,341 @@
+def _as_date(d):
+    """
+    Normaliza una fecha recibida como `date` o como texto ISO ("YYYY-MM-DD").
+
+    Parameters
+    ----------
+    d : datetime.date or str
+        Fecha a normalizar.
+
+    Returns
+    -------
+    datetime.date
+    """
+    if isinstance(d, date):
+        return d
+    return date.fromisoformat(str(d).strip()[:10])
+
+def _next_month(d):
+    """Devuelve el primer día del mes siguiente a `d`."""
+    return date(d.year + (d.month // 12), d.month % 12 + 1, 1)
+
+def date_windows(start, end, step="month"):
+    """
+    Divide el rango [start, end) en ventanas consecutivas de fecha.
+
+    Las ventanas son semiabiertas: incluyen `desde` y excluyen `hasta`, de modo que
+    ningún documento cae en dos ventanas. Con step="week" y step="month" la primera
+    y la última ventana se recortan al rango pedido.
+
+    Parameters
+    ----------
+    start : datetime.date or str
+        Fecha inicial (incluida), ej. "2022-01-01".
+    end : datetime.date or str
+        Fecha final (excluida), ej. "2025-01-01".
+    step : str, optional
+        "day", "week" o "month". Por defecto "month".
+
+    Returns
+    -------
+    list[tuple[str, str]]
+        Lista de ventanas (desde, hasta) en formato ISO.
+    """
+    start, end = _as_date(start), _as_date(end)
+    if step not in ("day", "week", "month"):
+        raise ValueError(f"step no soportado: {step}")
+
+    windows = []
+    cur = start
+    while cur < end:
+        if step == "day":
+            nxt = cur + timedelta(days=1)
+        elif step == "week":
+            nxt = cur + timedelta(days=7 - cur.weekday())
+        else:
+            nxt = _next_month(cur)
+        nxt = min(nxt, end)
+        windows.append((cur.isoformat(), nxt.isoformat()))
+        cur = nxt
+    return windows
+
+def window_filter(desde, hasta, where=None, field="DocDate"):
+    """
+    Construye el $filter OData de una ventana de fechas, combinado con un filtro extra.
+
+    Parameters
+    ----------
+    desde : str
+        Fecha inicial (incluida).
+    hasta : str
+        Fecha final (excluida).
+    where : str, optional
+        Filtro adicional, ej. "CardCode eq 'C0001'".
+    field : str, optional
+        Campo de fecha a usar. Por defecto "DocDate".
+
+    Returns
+    -------
+    str
+        Expresión $filter lista para stream_entity / service_count.
+    """
+    flt = f"{field} ge {desde} and {field} lt {hasta}"
+    if where:
+        flt = f"({where}) and {flt}"
+    return flt
+
+def adaptive_date_windows(session, start, end, max_rows=20000, step="month",
+                          entity="Invoices", where=None):
+    """
+    Genera ventanas de fecha cuyo volumen no supera `max_rows` según /$count.
+
+    Parte de las ventanas de `date_windows(start, end, step)` y divide a la mitad
+    cada ventana cuyo conteo excede `max_rows`, hasta llegar a ventanas de un día.
+    Las ventanas vacías se descartan.
+
+    Parameters
+    ----------
+    session : requests.Session
+        Sesión autenticada.
+    start, end : datetime.date or str
+        Rango [start, end).
+    max_rows : int, optional
+        Máximo de documentos deseado por ventana.
+    step : str, optional
+        Granularidad inicial ("day", "week" o "month").
+    entity : str, optional
+        Entidad a contar. Por defecto "Invoices".
+    where : str, optional
+        Filtro adicional combinado con cada ventana.
+
+    Returns
+    -------
+    list[tuple[str, str]]
+        Ventanas (desde, hasta) en formato ISO, en orden cronológico.
+    """
+    pending = list(date_windows(start, end, step))
+    result = []
+
+    while pending:
+        desde, hasta = pending.pop(0)
+        n = service_count(session, entity, where=window_filter(desde, hasta, where))
+        if n == 0:
+            continue
+
+        d0, d1 = _as_date(desde), _as_date(hasta)
+        days = (d1 - d0).days
+        if n is None or n <= max_rows or days <= 1:
+            result.append((desde, hasta))
+            continue
+
+        mid = (d0 + timedelta(days=days // 2)).isoformat()
+        pending[:0] = [(desde, mid), (mid, hasta)]
+
+    return result
+
+def export_invoice_window(session, desde, hasta, out_path, where=None, lines_path=None):
+    """
+    Exporta los encabezados OINV (y opcionalmente las líneas INV1) de una ventana de fechas.
+
+    Ambos archivos se escriben con export_csv: publicación atómica (una ventana
+    fallida no deja archivos a medias), entrada en el manifiesto con hash y rango
+    de DocEntry, control contra /$count de la ventana y shards con SL_SHARD_*.
+
+    Parameters
+    ----------
+    session : requests.Session
+        Sesión autenticada.
+    desde, hasta : str
+        Ventana [desde, hasta) sobre DocDate.
+    out_path : str
+        Ruta del shard OINV de la ventana.
+    where : str, optional
+        Filtro adicional combinado con la ventana.
+    lines_path : str, optional
+        Si se indica, también se exportan las líneas INV1 de la ventana a esa ruta.
+
+    Returns
+    -------
+    tuple[int, int]
+        (encabezados escritos, líneas escritas).
+    """
+    flt = window_filter(desde, hasta, where)
+    expected = service_count(session, "Invoices", where=flt)
+    written, doc_entries = 0, []
+
+    with profile_stage("export", f"OINV_{desde}"), \
+            export_csv(out_path, OINV_HEADER, table="OINV", expected=expected,
+                       watermark="DocEntry", stage=None) as w:
+        for o in stream_entity(session, "Invoices", select=OINV_SELECT,
+                               orderby="DocEntry", where=flt):
+            w.writerow(oinv_row(o))
+            written += 1
+            if lines_path:
+                doc_entries.append(o.get("DocEntry"))
+
+    written_lines = 0
+    if lines_path:
+        with profile_stage("export", f"INV1_{desde}"), \
+                export_csv(lines_path, INV1_HEADER, table="INV1", watermark="DocEntry", stage=None) as w:
+            for de in doc_entries:
+                for l in sl_fetch_invoice_lines(session, BASE, de):
+                    w.writerow(inv1_row(de, l))
+                    written_lines += 1
+
+    return written, written_lines
+
+def window_done(path):
+    """True si el archivo de una ventana ya se exportó completo (existe o sus shards están completos)."""
+    return os.path.exists(path) or shard_files(path)[1]
+
+def merge_invoice_shards(shard_paths, out_path, key_columns=1):
+    """
+    Une shards CSV ya ordenados por DocEntry en un único archivo ordenado (merge k-way).
+
+    Acepta también rutas lógicas partidas con SL_SHARD_*: se expanden a sus shards
+    publicados según el manifiesto.
+
+    Cada shard se lee en streaming, por lo que la memoria usada no depende del
+    tamaño total. Sirve tanto para OINV (clave DocEntry) como para INV1
+    (clave DocEntry, LineNum con key_columns=2).
+
+    Parameters
+    ----------
+    shard_paths : list[str]
+        Shards a unir; todos deben tener el mismo encabezado.
+    out_path : str
+        Ruta del CSV combinado.
+    key_columns : int, optional
+        Número de columnas numéricas iniciales que forman la clave de orden.
+
+    Returns
+    -------
+    int
+        Número de filas escritas (sin encabezado).
+    """
+    def _key(row):
+        return tuple(int(row[i] or 0) for i in range(key_columns))
+
+    paths = [p for sp in shard_paths for p in ([q for q in shard_files(sp)[0] if q != sp] or [sp])]
+    files = [open(p, newline="", encoding="utf-8") for p in paths]
+    written = 0
+    try:
+        readers = [csv.reader(f) for f in files]
+        header = None
+        for rd in readers:
+            header = next(rd, None) or header
+
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        with export_csv(out_path, header or [], stage=None) as w:
+            for row in heapq.merge(*readers, key=_key):
+                w.writerow(row)
+                written += 1
+    finally:
+        for f in files:
+            f.close()
+
+    return written
+
+def export_invoices_by_window_csv(session, start, end, out_dir=TMPDIR, step="month",
+                                  max_rows_per_window=None, max_workers=4, where=None,
+                                  windows=None, with_lines=False, merged_path=None,
+                                  merged_lines_path=None, resume=False):
+    """
+    Exporta facturas (OINV y opcionalmente INV1) de un rango de fechas dividido en ventanas
+    que se extraen en paralelo.
+
+    - Cada ventana genera su propio shard: OINV_<desde>_<hasta>.csv (e INV1_... si
+      with_lines=True), escrito con export_csv (atómico, en el manifiesto, partido en
+      shards si SL_SHARD_ROWS/SL_SHARD_MB).
+    - Con `max_rows_per_window` las ventanas se ajustan según /$count
+      (ver adaptive_date_windows).
+    - Una ventana que falla no detiene a las demás: se reporta en `failed` y se puede
+      volver a ejecutar sola pasando `windows=resultado["failed"]`, o relanzando la
+      misma llamada con `resume=True` (se saltan los shards ya completos).
+    - Si se indica `merged_path` y no hubo fallos, los shards se combinan en un único
+      archivo ordenado por DocEntry (ídem `merged_lines_path` para INV1, por DocEntry, LineNum).
+
+    Parameters
+    ----------
+    session : requests.Session
+        Sesión autenticada.
+    start, end : datetime.date or str
+        Rango [start, end) sobre DocDate.
+    out_dir : str, optional
+        Carpeta de los shards. Por defecto TMPDIR.
+    step : str, optional
+        "day", "week" o "month".
+    max_rows_per_window : int, optional
+        Activa el ajuste adaptativo de ventanas por conteo.
+    max_workers : int, optional
+        Ventanas extraídas en paralelo.
+    where : str, optional
+        Filtro OData adicional.
+    windows : list[tuple[str, str]], optional
+        Ventanas explícitas a ejecutar (ej. las fallidas de una corrida anterior).
+    with_lines : bool, optional
+        Exportar también las líneas INV1 de cada ventana.
+    merged_path : str, optional
+        Ruta del OINV combinado y ordenado por DocEntry.
+    merged_lines_path : str, optional
+        Ruta del INV1 combinado (requiere with_lines=True).
+    resume : bool, optional
+        Saltar ventanas cuyo shard ya está completo (ver window_done).
+
+    Returns
+    -------
+    dict
+        {"rows", "lines", "shards", "line_shards", "failed"}.
+    """
+    if windows is None:
+        if max_rows_per_window:
+            windows = adaptive_date_windows(session, start, end, max_rows_per_window,
+                                            step=step, where=where)
+        else:
+            windows = date_windows(start, end, step)
+
+    def _paths(desde, hasta):
+        head = os.path.join(out_dir, f"OINV_{desde}_{hasta}.csv")
+        lines = os.path.join(out_dir, f"INV1_{desde}_{hasta}.csv") if with_lines else None
+        return head, lines
+
+    t0 = time.time()
+    rows, lines, failed = 0, 0, []
+    print(f"Ventanas a exportar: {len(windows)} (workers={max_workers})")
+    size_session_pool(session, max_workers)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        futs = {}
+        for desde, hasta in windows:
+            head, lines_path = _paths(desde, hasta)
+            if resume and window_done(head) and (lines_path is None or window_done(lines_path)):
+                continue
+            fut = ex.submit(export_invoice_window, session, desde, hasta, head, where, lines_path)
+            futs[fut] = (desde, hasta)
+
+        for fut in as_completed(futs):
+            desde, hasta = futs[fut]
+            try:
+                n_docs, n_lines = fut.result()
+            except Exception as e:
+                print(f"[WARN] Ventana {desde}..{hasta} falló: {e}")
+                failed.append((desde, hasta))
+                continue
+            rows += n_docs
+            lines += n_lines
+            print(f"  -> ventana {desde}..{hasta}: {n_docs} facturas, {n_lines} líneas")
+
+    shards = [_paths(d, h)[0] for d, h in windows]
+    line_shards = [_paths(d, h)[1] for d, h in windows] if with_lines else []
+    failed.sort()
+
+    if not failed:
+        if merged_path:
+            merge_invoice_shards(shards, merged_path)
+        if merged_lines_path and with_lines:
+            merge_invoice_shards(line_shards, merged_lines_path, key_columns=2)
+
+    print(f"✅ OINV por ventanas: {rows} filas en {len(futs)} ventanas, "
+          f"{len(failed)} fallidas ({time.time()-t0:.1f}s)")
+    return {"rows": rows, "lines": lines, "shards": shards,
+            "line_shards": line_shards, "failed": failed}
@@ -0,0 +1,241 @@
+LOOKUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    ItemCode  TEXT    NOT NULL,
+    PriceList INTEGER NOT NULL,
+    Price     REAL,
+    Currency  TEXT,
+    PRIMARY KEY (ItemCode, PriceList)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stock (
+    ItemCode  TEXT NOT NULL,
+    Warehouse TEXT NOT NULL,
+    InStock   REAL NOT NULL,
+    PRIMARY KEY (ItemCode, Warehouse)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS items (
+    ItemCode     TEXT PRIMARY KEY,
+    InStockTotal REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+) WITHOUT ROWID;
+"""
+
+def _csv_float(v):
+    return float(v) if v not in (None, "") else None
+
+def update_lookup_store(store_path, prices=None, stock_path=None):
+    """
+    Actualiza el store SQLite de consulta del POS y lo publica de forma atómica.
+
+    Se trabaja sobre una copia temporal única (mkstemp en la misma carpeta): se
+    reemplaza sólo lo que cambió (una lista de precios y/o todo el stock) y al
+    terminar se publica con os.replace. Los lectores abiertos siguen viendo la
+    versión anterior hasta que llaman a LookupStore.refresh().
+
+    Copia, actualización y publicación se hacen bajo un bloqueo `<store>.lock`,
+    así los exportadores de precios y de stock corriendo en paralelo (en otros
+    procesos) no pisan sus cambios.
+
+    Las tablas son WITHOUT ROWID con clave primaria compuesta, así el índice
+    agrupado ya resuelve ItemCode, (ItemCode, PriceList) y (ItemCode, Warehouse).
+
+    Parameters
+    ----------
+    store_path : str
+        Ruta del .sqlite publicado.
+    prices : tuple[int, str], optional
+        (pricelist_no, ruta de ITEMPRICE_PL#.csv) generado por export_prices_csv.
+    stock_path : str, optional
+        sl_stock_por_bodega.csv (ItemCode, Warehouse, InStock); también recalcula
+        los totales por ItemCode.
+
+    Returns
+    -------
+    str
+        Ruta del store publicado.
+    """
+    t0 = time.time()
+    folder = os.path.dirname(store_path) or "."
+    os.makedirs(folder, exist_ok=True)
+    with FileLock(store_path + ".lock"):
+        fd, tmp = tempfile.mkstemp(dir=folder, prefix=os.path.basename(store_path) + ".", suffix=".part")
+        os.close(fd)
+        try:
+            if os.path.exists(store_path):
+                shutil.copyfile(store_path, tmp)
+            _fill_lookup_store(tmp, prices, stock_path)
+            os.replace(tmp, store_path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    print(f"✅ Store de consulta publicado: {store_path} ({time.time()-t0:.1f}s)")
+    return store_path
+
+def _fill_lookup_store(db_path, prices, stock_path):
+    """Aplica en `db_path` (copia de trabajo) los cambios de update_lookup_store."""
+    con = sqlite3.connect(db_path)
+    try:
+        con.executescript(LOOKUP_SCHEMA)
+        with con:
+            if prices is not None:
+                pricelist_no, path = prices
+                cols, rows = read_csv_rows(path)
+                ic, pc, cc = cols["ItemCode"], cols["Price"], cols["Currency"]
+                con.execute("DELETE FROM prices WHERE PriceList = ?", (int(pricelist_no),))
+                con.executemany(
+                    "INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?)",
+                    ((r[ic], int(pricelist_no), _csv_float(r[pc]), r[cc] or None) for r in rows),
+                )
+                con.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                            (f"prices_pl{int(pricelist_no)}", time.strftime("%Y-%m-%dT%H:%M:%S")))
+            if stock_path is not None:
+                cols, rows = read_csv_rows(stock_path)
+                ic, wc, sc = cols["ItemCode"], cols["Warehouse"], cols["InStock"]
+                con.execute("DELETE FROM stock")
+                con.executemany(
+                    "INSERT OR REPLACE INTO stock VALUES (?, ?, ?)",
+                    ((r[ic], r[wc], float(r[sc] or 0)) for r in rows),
+                )
+                con.execute("DELETE FROM items")
+                con.execute("INSERT INTO items SELECT ItemCode, SUM(InStock) FROM stock GROUP BY ItemCode")
+                con.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                            ("stock", time.strftime("%Y-%m-%dT%H:%M:%S")))
+        con.execute("ANALYZE")
+    finally:
+        con.close()
+
+class LookupStore:
+    """
+    API de consulta de precios y stock sobre el store SQLite (sólo lectura).
+
+    Parameters
+    ----------
+    store_path : str
+        Ruta del store publicado por update_lookup_store.
+
+    Examples
+    --------
+    >>> st = LookupStore(LOOKUP_STORE)
+    >>> st.price("A00001", 1)
+    (1.5, 'USD')
+    >>> st.stock("A00001", "01")
+    2.0
+    """
+
+    def __init__(self, store_path):
+        self.store_path = store_path
+        self.con = None
+        self._ident = None
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        """Reabre el store si se publicó una versión nueva. Devuelve True si cambió."""
+        st = os.stat(self.store_path)
+        ident = (st.st_ino, st.st_mtime_ns)
+        if not force and ident == self._ident:
+            return False
+        if self.con is not None:
+            self.con.close()
+        uri = "file:" + quote(os.path.abspath(self.store_path)) + "?mode=ro"
+        self.con = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self._ident = ident
+        return True
+
+    def price(self, code, pricelist_no):
+        """(Price, Currency) de un ítem en una lista, o None."""
+        return self.con.execute(
+            "SELECT Price, Currency FROM prices WHERE ItemCode = ? AND PriceList = ?",
+            (code, pricelist_no)).fetchone()
+
+    def prices(self, code):
+        """{PriceList: (Price, Currency)} de un ítem."""
+        rows = self.con.execute("SELECT PriceList, Price, Currency FROM prices WHERE ItemCode = ?", (code,))
+        return {pl: (p, c) for pl, p, c in rows}
+
+    def stock(self, code, warehouse=None):
+        """Stock de un ítem en una bodega, o el total si no se indica bodega (0.0 si no hay)."""
+        if warehouse is None:
+            row = self.con.execute("SELECT InStockTotal FROM items WHERE ItemCode = ?", (code,)).fetchone()
+        else:
+            row = self.con.execute("SELECT InStock FROM stock WHERE ItemCode = ? AND Warehouse = ?",
+                                   (code, warehouse)).fetchone()
+        return row[0] if row else 0.0
+
+    def stock_by_warehouse(self, code):
+        """{Warehouse: InStock} de un ítem."""
+        return dict(self.con.execute("SELECT Warehouse, InStock FROM stock WHERE ItemCode = ?", (code,)))
+
+    def _batch(self, sql, codes, args=(), chunk=500):
+        codes = list(codes)
+        for i in range(0, len(codes), chunk):
+            part = codes[i:i + chunk]
+            marks = ",".join("?" * len(part))
+            yield from self.con.execute(sql.format(marks=marks), (*args, *part))
+
+    def prices_many(self, codes, pricelist_no):
+        """{ItemCode: (Price, Currency)} para varios ítems de una lista (los que existan)."""
+        sql = "SELECT ItemCode, Price, Currency FROM prices WHERE PriceList = ? AND ItemCode IN ({marks})"
+        return {c: (p, cur) for c, p, cur in self._batch(sql, codes, (pricelist_no,))}
+
+    def stock_many(self, codes, warehouse=None):
+        """{ItemCode: stock} para varios ítems (total o de una bodega)."""
+        if warehouse is None:
+            sql = "SELECT ItemCode, InStockTotal FROM items WHERE ItemCode IN ({marks})"
+            return dict(self._batch(sql, codes))
+        sql = "SELECT ItemCode, InStock FROM stock WHERE Warehouse = ? AND ItemCode IN ({marks})"
+        return dict(self._batch(sql, codes, (warehouse,)))
+
+    def close(self):
+        if self.con is not None:
+            self.con.close()
+            self.con = None
+
+def benchmark_lookup_store(store_path, n=100_000, pricelist_no=1, batch=100):
+    """
+    Mide consultas/s del store: puntuales de precio y stock, y por lotes.
+
+    Parameters
+    ----------
+    store_path : str
+        Store publicado.
+    n : int, optional
+        Consultas por prueba.
+    pricelist_no : int, optional
+        Lista de precios para las consultas de precio.
+    batch : int, optional
+        Tamaño de lote para prices_many / stock_many.
+
+    Returns
+    -------
+    dict
+        {"price": consultas/s, "stock": ..., "stock_whs": ..., "prices_many": ..., "stock_many": ...}
+    """
+    st = LookupStore(store_path)
+    codes = [r[0] for r in st.con.execute("SELECT ItemCode FROM items")] or \
+            [r[0] for r in st.con.execute("SELECT DISTINCT ItemCode FROM prices")]
+    whs = [r[0] for r in st.con.execute("SELECT DISTINCT Warehouse FROM stock")] or [""]
+    if not codes:
+        print("[WARN] Store vacío")
+        return {}
+    rnd = random.Random(7)
+    sample = [rnd.choice(codes) for _ in range(n)]
+    results = {}
+
+    def _run(name, fn, calls, per_call=1):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        results[name] = calls * per_call / dt
+        print(f"  {name:<12}: {results[name]:>12,.0f} consultas/s ({dt / calls * 1e6:.1f} µs por llamada)")
+
+    _run("price", lambda: [st.price(c, pricelist_no) for c in sample], n)
+    _run("stock", lambda: [st.stock(c) for c in sample], n)
+    _run("stock_whs", lambda: [st.stock(c, whs[i % len(whs)]) for i, c in enumerate(sample)], n)
+    batches = [sample[i:i + batch] for i in range(0, n, batch)]
+    _run("prices_many", lambda: [st.prices_many(b, pricelist_no) for b in batches], len(batches), batch)
+    _run("stock_many", lambda: [st.stock_many(b) for b in batches], len(batches), batch)
+    st.close()
+    return results
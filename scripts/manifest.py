@@ -0,0 +1,529 @@
+MANIFEST_NAME = "manifest.json"
+SCHEMA_VERSION = 1
+# Subir la versión de una tabla cuando cambie su layout (columnas, formato de valores)
+SCHEMA_VERSIONS = {}
+
+def shard_path(out_path, n):
+    """Ruta del shard `n` (desde 1) de una salida: INV1.csv -> INV1.00001.csv."""
+    root, ext = os.path.splitext(out_path)
+    return f"{root}.{n:05d}{ext or '.csv'}"
+
+def _clear_shards(out_path):
+    """
+    Borra los shards de una exportación anterior de `out_path` (archivos y
+    entradas del manifiesto), para que no queden mezclados con los nuevos.
+    """
+    name = os.path.basename(out_path)
+    path = manifest_path(out_path)
+    with FileLock(path + ".lock"):
+        files = load_manifest(path)
+        old = [n for n, e in files.items() if e.get("shard_of") == name]
+        for n in old:
+            del files[n]
+            p = os.path.join(os.path.dirname(out_path), n)
+            if os.path.exists(p):
+                os.remove(p)
+        if old:
+            _write_manifest(path, files)
+
+class ManifestCSV:
+    """
+    Writer CSV que, además de escribir el archivo, calcula en streaming lo que
+    necesita el manifiesto: filas, bytes, SHA-256 del contenido y watermark.
+
+    - Se escribe a `<out_path>.part` y se publica con os.replace al cerrar sin
+      errores, así un consumidor nunca ve un archivo a medias.
+    - El hash se calcula sobre los mismos bytes que se escriben (UTF-8, "\\r\\n"
+      de csv.writer), sin releer el archivo.
+    - Al cerrar se registra la entrada en el manifest.json de la carpeta de salida
+      y se compara el número de filas contra `expected` (/$count).
+    - Con `key`, la entrada guarda además el rango de claves escrito (key_min/key_max).
+
+    Usar vía export_csv().
+    """
+
+    def __init__(self, out_path, header, table=None, expected=None, watermark=None,
+                 schema_version=None, stage=None, key=None, shard_of=None):
+        self.out_path = out_path
+        self.tmp_path = out_path + ".part"
+        self.header = list(header)
+        self.table = table or os.path.splitext(os.path.basename(out_path))[0]
+        self.expected = expected
+        self.schema_version = schema_version or SCHEMA_VERSIONS.get(self.table, SCHEMA_VERSION)
+        self.stage = stage
+        self.wm_index = self.header.index(watermark) if watermark else None
+        self.watermark = None
+        self.key = key
+        self.key_index = self.header.index(key) if key else None
+        self.key_min = self.key_max = None
+        self.shard_of = shard_of
+        self.rows = 0
+        self.bytes = 0
+        self.entry = None
+        self._hash = hashlib.sha256()
+
+    # -- interfaz de archivo para csv.writer --
+    def write(self, s):
+        b = s.encode("utf-8")
+        self._hash.update(b)
+        self.bytes += len(b)
+        return self._f.write(b)
+
+    def writerow(self, row):
+        if self.wm_index is not None:
+            v = row[self.wm_index]
+            if v not in (None, "") and (self.watermark is None or v > self.watermark):
+                self.watermark = v
+        if self.key_index is not None:
+            k = row[self.key_index]
+            if k not in (None, ""):
+                if self.key_min is None or k < self.key_min:
+                    self.key_min = k
+                if self.key_max is None or k > self.key_max:
+                    self.key_max = k
+        self._w.writerow(row)
+        self.rows += 1
+
+    def write_block(self, block, rows):
+        """Escribe un bloque CSV ya codificado (bytes) con `rows` filas."""
+        self._hash.update(block)
+        self.bytes += len(block)
+        self._f.write(block)
+        self.rows += rows
+
+    def __enter__(self):
+        self._profile = profile_stage(self.stage, self.table) if self.stage else None
+        if self._profile is not None:
+            self._profile.__enter__()
+        os.makedirs(os.path.dirname(self.out_path) or ".", exist_ok=True)
+        if self.shard_of is None:
+            _clear_shards(self.out_path)
+        self.t0 = time.time()
+        self._f = open(self.tmp_path, "wb")
+        self._w = csv.writer(self)
+        self._w.writerow(self.header)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._f.close()
+        if self._profile is not None:
+            self._profile.__exit__(exc_type, exc, tb)
+        if exc_type is not None:
+            os.remove(self.tmp_path)
+            return False
+
+        os.replace(self.tmp_path, self.out_path)
+        count_ok = self.expected is None or self.expected == self.rows
+        if not count_ok:
+            print(f"[WARN] {self.table}: {self.rows} filas escritas pero /$count reporta {self.expected}")
+        self.entry = {
+            "file": os.path.basename(self.out_path),
+            "table": self.table,
+            "rows": self.rows,
+            "service_count": self.expected,
+            "count_ok": count_ok,
+            "sha256": self._hash.hexdigest(),
+            "bytes": self.bytes,
+            "schema_version": self.schema_version,
+            "columns": self.header,
+            "watermark": self.watermark,
+            "written_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "seconds": round(time.time() - self.t0, 3),
+        }
+        if self.key is not None:
+            self.entry.update({"key": self.key, "key_min": self.key_min, "key_max": self.key_max})
+        if self.shard_of is not None:
+            self.entry["shard_of"] = self.shard_of
+        update_manifest(self.out_path, self.entry)
+        return False
+
+class ShardedCSV:
+    """
+    Writer con la misma interfaz que ManifestCSV que reparte la salida en shards
+    numerados (INV1.00001.csv, INV1.00002.csv, ...) por filas y/o bytes.
+
+    - Cada shard es un ManifestCSV: tiene su propio encabezado, se publica con
+      os.replace apenas se llena y queda en el manifiesto con filas, hash y rango
+      de claves (key_min/key_max), así el cargador puede ir tomando shards
+      mientras la exportación sigue (ver iter_shards).
+    - La salida lógica (INV1.csv) queda en el manifiesto con la lista de shards y
+      "complete": false hasta que termina; ese archivo no se escribe. Si la
+      exportación falla queda con "failed": true (estado final: iter_shards
+      lanza RuntimeError en lugar de esperar).
+    - write_block corta sólo entre bloques, así que un shard puede pasar un poco
+      del límite.
+
+    Usar vía export_csv(..., shard_rows=..., shard_bytes=...).
+    """
+
+    def __init__(self, out_path, header, table=None, expected=None, watermark=None,
+                 schema_version=None, stage=None, key=None, shard_rows=None, shard_bytes=None):
+        self.out_path = out_path
+        self.header = list(header)
+        self.table = table or os.path.splitext(os.path.basename(out_path))[0]
+        self.expected = expected
+        self.watermark_col = watermark
+        self.schema_version = schema_version or SCHEMA_VERSIONS.get(self.table, SCHEMA_VERSION)
+        self.stage = stage
+        self.key = key
+        self.shard_rows = shard_rows
+        self.shard_bytes = shard_bytes
+        self.shards = []
+        self.rows = 0
+        self.entry = None
+        self._cur = None
+
+    @property
+    def bytes(self):
+        return sum(e["bytes"] for e in self.shards) + (self._cur.bytes if self._cur else 0)
+
+    def _open_shard(self):
+        self._cur = ManifestCSV(shard_path(self.out_path, len(self.shards) + 1), self.header,
+                                table=self.table, watermark=self.watermark_col,
+                                schema_version=self.schema_version, key=self.key,
+                                shard_of=os.path.basename(self.out_path))
+        self._cur.__enter__()
+
+    def _close_shard(self):
+        self._cur.__exit__(None, None, None)
+        self.shards.append(self._cur.entry)
+        self._cur = None
+        self._publish(complete=False)
+
+    def _after_write(self):
+        cur = self._cur
+        if (self.shard_rows and cur.rows >= self.shard_rows) or \
+                (self.shard_bytes and cur.bytes >= self.shard_bytes):
+            self._close_shard()
+
+    def writerow(self, row):
+        if self._cur is None:
+            self._open_shard()
+        self._cur.writerow(row)
+        self.rows += 1
+        self._after_write()
+
+    def write_block(self, block, rows):
+        """Escribe un bloque CSV ya codificado (bytes) con `rows` filas."""
+        if self._cur is None:
+            self._open_shard()
+        self._cur.write_block(block, rows)
+        self.rows += rows
+        self._after_write()
+
+    def _publish(self, complete, failed=False):
+        wms = [e["watermark"] for e in self.shards if e.get("watermark") not in (None, "")]
+        count_ok = not complete or self.expected is None or self.expected == self.rows
+        self.entry = {
+            "file": os.path.basename(self.out_path),
+            "table": self.table,
+            "rows": self.rows,
+            "service_count": self.expected,
+            "count_ok": count_ok,
+            # hash de la salida lógica: cambia si cambia cualquier shard
+            "sha256": hashlib.sha256("".join(e["sha256"] for e in self.shards).encode()).hexdigest(),
+            "bytes": sum(e["bytes"] for e in self.shards),
+            "schema_version": self.schema_version,
+            "columns": self.header,
+            "watermark": max(wms) if wms else None,
+            "key": self.key,
+            "shards": [e["file"] for e in self.shards],
+            "complete": complete,
+            "failed": failed,
+            "written_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "seconds": round(time.time() - self.t0, 3),
+        }
+        update_manifest(self.out_path, self.entry)
+
+    def __enter__(self):
+        self._profile = profile_stage(self.stage, self.table) if self.stage else None
+        if self._profile is not None:
+            self._profile.__enter__()
+        os.makedirs(os.path.dirname(self.out_path) or ".", exist_ok=True)
+        _clear_shards(self.out_path)
+        if os.path.exists(self.out_path):
+            os.remove(self.out_path)
+        self.t0 = time.time()
+        self._publish(complete=False)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is not None:
+                if self._cur is not None:
+                    self._cur.__exit__(exc_type, exc, tb)
+                try:
+                    self._publish(complete=False, failed=True)
+                except Exception as e:
+                    print(f"[WARN] {self.table}: no se pudo marcar la exportación como fallida ({e})")
+                return False
+            if self._cur is not None or not self.shards:
+                if self._cur is None:
+                    self._open_shard()      # salida vacía: un shard sólo con encabezado
+                self._close_shard()
+            self._publish(complete=True)
+            if not self.entry["count_ok"]:
+                print(f"[WARN] {self.table}: {self.rows} filas escritas pero /$count reporta {self.expected}")
+            return False
+        finally:
+            if self._profile is not None:
+                self._profile.__exit__(exc_type, exc, tb)
+
+def export_csv(out_path, header, table=None, expected=None, watermark=None, schema_version=None, stage="export",
+               key=None, shard_rows=None, shard_bytes=None):
+    """
+    Abre un CSV de exportación con manifiesto (ver ManifestCSV), o en shards (ver
+    ShardedCSV) si hay límite de filas o bytes por shard.
+
+    Parameters
+    ----------
+    out_path : str
+        Ruta final del CSV.
+    header : list[str]
+        Encabezado; se escribe al abrir.
+    table : str, optional
+        Nombre lógico (ej. "OITB"). Por defecto el nombre del archivo sin extensión.
+    expected : int, optional
+        Conteo del servicio (service_count) para validar las filas escritas.
+    watermark : str, optional
+        Columna cuyo máximo se guarda como watermark (ej. "UpdateDate", "DocEntry").
+    schema_version : int, optional
+        Versión del layout. Por defecto SCHEMA_VERSIONS[table] o SCHEMA_VERSION.
+    stage : str, optional
+        Etapa de perfilado (ver profile_stage). None para no perfilar.
+    key : str, optional
+        Columna cuyo rango (mín/máx) se guarda por archivo o shard. Por defecto la
+        primera columna del encabezado.
+    shard_rows : int, optional
+        Filas máximas por shard. Por defecto SHARD_ROWS (SL_SHARD_ROWS); 0 = sin límite.
+    shard_bytes : int, optional
+        Bytes máximos por shard. Por defecto SHARD_BYTES (SL_SHARD_MB); 0 = sin límite.
+
+    Returns
+    -------
+    ManifestCSV or ShardedCSV
+        Context manager con writerow() / write_block().
+
+    Examples
+    --------
+    >>> with export_csv(path, ["ItmsGrpCod", "ItmsGrpNam"], table="OITB", expected=total) as w:
+    ...     for r in rows:
+    ...         w.writerow([r["Number"], r["GroupName"]])
+    """
+    key = key or (header[0] if header else None)
+    shard_rows = SHARD_ROWS if shard_rows is None else shard_rows
+    shard_bytes = SHARD_BYTES if shard_bytes is None else shard_bytes
+    if shard_rows or shard_bytes:
+        return ShardedCSV(out_path, header, table=table, expected=expected, watermark=watermark,
+                          schema_version=schema_version, stage=stage, key=key,
+                          shard_rows=shard_rows, shard_bytes=shard_bytes)
+    return ManifestCSV(out_path, header, table=table, expected=expected, watermark=watermark,
+                       schema_version=schema_version, stage=stage, key=key)
+
+def manifest_path(path):
+    """Ruta del manifest.json para una carpeta de salida o un archivo dentro de ella."""
+    if path.endswith(".json"):
+        return path
+    folder = path if os.path.isdir(path) else os.path.dirname(path)
+    return os.path.join(folder, MANIFEST_NAME)
+
+def load_manifest(path):
+    """
+    Lee un manifiesto.
+
+    Parameters
+    ----------
+    path : str
+        Carpeta de salida, archivo exportado o ruta del .json.
+
+    Returns
+    -------
+    dict
+        {nombre_archivo: entrada}. Vacío si no existe.
+    """
+    path = manifest_path(path)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("files", {})
+
+def _write_manifest(path, files):
+    """
+    Publica el manifiesto con un temporal único (mkstemp) + os.replace. Llamar
+    con FileLock(`path` + ".lock") tomado: precios y stock corren en procesos
+    distintos sobre la misma carpeta.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".",
+                               suffix=".part")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"files": files}, f, indent=2, sort_keys=True, default=str)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+def update_manifest(out_path, entry):
+    """Agrega o reemplaza la entrada de un archivo en el manifest.json de su carpeta."""
+    path = manifest_path(out_path)
+    with FileLock(path + ".lock"):
+        files = load_manifest(path)
+        files[entry["file"]] = entry
+        _write_manifest(path, files)
+
+def shard_files(out_path):
+    """
+    Archivos publicados de una salida según el manifiesto.
+
+    Parameters
+    ----------
+    out_path : str
+        Ruta lógica de la salida (ej. .../INV1.csv).
+
+    Returns
+    -------
+    tuple[list[str], bool]
+        (rutas de los shards ya publicados, exportación completa). Para una salida
+        sin shards, ([out_path], True); sin entrada en el manifiesto, ([], False).
+    """
+    e = load_manifest(out_path).get(os.path.basename(out_path))
+    if e is None:
+        return [], False
+    if "shards" not in e:
+        return [out_path], True
+    folder = os.path.dirname(out_path)
+    return [os.path.join(folder, n) for n in e["shards"]], bool(e.get("complete"))
+
+def iter_shards(out_path, poll=1.0, timeout=None):
+    """
+    Entrega cada shard de `out_path` apenas se publica, hasta que la exportación
+    termina. Pensado para que el cargador (RDS) ingiera shards en paralelo
+    mientras la extracción sigue corriendo en otro proceso.
+
+    Llamar después de que la exportación arrancó: antes, el manifiesto puede
+    tener todavía la entrada completa (o fallida) de la corrida anterior.
+
+    Parameters
+    ----------
+    out_path : str
+        Ruta lógica de la salida.
+    poll : float, optional
+        Segundos entre lecturas del manifiesto.
+    timeout : float, optional
+        Máximo de segundos esperando un shard nuevo.
+
+    Yields
+    ------
+    str
+        Ruta de un shard completo.
+
+    Raises
+    ------
+    RuntimeError
+        Si la exportación falló ("failed": true en el manifiesto), después de
+        entregar los shards que alcanzó a publicar.
+    TimeoutError
+        Si pasan `timeout` segundos sin shards nuevos.
+    """
+    name = os.path.basename(out_path)
+    seen, t_last = 0, time.time()
+    while True:
+        files, complete = shard_files(out_path)
+        if len(files) > seen:
+            yield from files[seen:]
+            seen, t_last = len(files), time.time()
+        if complete:
+            return
+        if load_manifest(out_path).get(name, {}).get("failed"):
+            raise RuntimeError(f"{out_path}: la exportación falló después de {seen} shards")
+        if timeout is not None and time.time() - t_last > timeout:
+            raise TimeoutError(f"{out_path}: sin shards nuevos en {timeout}s")
+        time.sleep(poll)
+
+def compare_manifests(old, new):
+    """
+    Compara dos manifiestos por hash de contenido y versión de esquema.
+
+    Parameters
+    ----------
+    old, new : dict or str
+        Manifiestos (dict de load_manifest) o rutas a ellos.
+
+    Returns
+    -------
+    dict
+        {"unchanged": [...], "changed": [...], "added": [...], "removed": [...],
+         "count_mismatch": [...]} con nombres de archivo.
+    """
+    old = load_manifest(old) if isinstance(old, str) else old
+    new = load_manifest(new) if isinstance(new, str) else new
+    out = {"unchanged": [], "changed": [], "added": [], "removed": [], "count_mismatch": []}
+    for name, e in sorted(new.items()):
+        prev = old.get(name)
+        if prev is None:
+            out["added"].append(name)
+        elif prev.get("sha256") == e.get("sha256") and prev.get("schema_version") == e.get("schema_version"):
+            out["unchanged"].append(name)
+        else:
+            out["changed"].append(name)
+        if not e.get("count_ok", True):
+            out["count_mismatch"].append(name)
+    out["removed"] = sorted(set(old) - set(new))
+    return out
+
+def changed_outputs(out_dir, loaded_manifest=None):
+    """
+    Archivos de `out_dir` que cambiaron desde la última carga (para MariaDB / POS).
+    Las salidas en shards se comparan shard por shard: sólo se devuelven los
+    shards nuevos o distintos.
+
+    El consumidor guarda una copia del manifiesto de lo que ya cargó (mark_loaded);
+    aquí se compara contra el manifiesto actual y se devuelven sólo los archivos
+    nuevos o con otro hash/esquema. Los archivos con filas distintas a /$count se
+    avisan (y se devuelven igual: decidir si cargarlos es del consumidor).
+
+    Parameters
+    ----------
+    out_dir : str
+        Carpeta de salida de los exportadores.
+    loaded_manifest : str, optional
+        Manifiesto de lo ya cargado. Por defecto <out_dir>/manifest.loaded.json.
+
+    Returns
+    -------
+    list[str]
+        Rutas de los archivos a cargar.
+    """
+    loaded_manifest = loaded_manifest or os.path.join(out_dir, "manifest.loaded.json")
+    diff = compare_manifests(loaded_manifest, out_dir)
+    for name in diff["count_mismatch"]:
+        print(f"[WARN] {name}: las filas escritas no coinciden con /$count")
+    if diff["unchanged"]:
+        print(f"Sin cambios (se omiten): {', '.join(diff['unchanged'])}")
+    current = load_manifest(out_dir)
+    return [os.path.join(out_dir, n) for n in diff["changed"] + diff["added"]
+            if "shards" not in current.get(n, {})]
+
+def mark_loaded(out_dir, files=None, loaded_manifest=None):
+    """
+    Registra como cargados los archivos indicados (por defecto todos) copiando sus
+    entradas del manifiesto actual a manifest.loaded.json.
+
+    Parameters
+    ----------
+    out_dir : str
+        Carpeta de salida de los exportadores.
+    files : Iterable[str], optional
+        Rutas o nombres de archivo cargados con éxito.
+    loaded_manifest : str, optional
+        Por defecto <out_dir>/manifest.loaded.json.
+    """
+    loaded_manifest = loaded_manifest or os.path.join(out_dir, "manifest.loaded.json")
+    current = load_manifest(out_dir)
+    names = [os.path.basename(f) for f in files] if files is not None else list(current)
+    with FileLock(loaded_manifest + ".lock"):
+        loaded = load_manifest(loaded_manifest)
+        for n in names:
+            if n in current:
+                loaded[n] = current[n]
+        _write_manifest(loaded_manifest, loaded)
@@ -0,0 +1,310 @@
+DOCUMENT_TABLES = {
+    # Ventas
+    "Quotations":            ("OQUT", "QUT1"),
+    "Orders":                ("ORDR", "RDR1"),
+    "DeliveryNotes":         ("ODLN", "DLN1"),
+    "Returns":               ("ORDN", "RDN1"),
+    "Invoices":              ("OINV", "INV1"),
+    "CreditNotes":           ("ORIN", "RIN1"),
+    "DownPayments":          ("ODPI", "DPI1"),
+    # Compras
+    "PurchaseQuotations":    ("OPQT", "PQT1"),
+    "PurchaseOrders":        ("OPOR", "POR1"),
+    "PurchaseDeliveryNotes": ("OPDN", "PDN1"),
+    "PurchaseReturns":       ("ORPD", "RPD1"),
+    "PurchaseInvoices":      ("OPCH", "PCH1"),
+    "PurchaseCreditNotes":   ("ORPC", "RPC1"),
+    "PurchaseDownPayments":  ("ODPO", "DPO1"),
+}
+
+DEFAULT_DOCUMENTS = ("Invoices", "CreditNotes", "Orders", "DeliveryNotes", "PurchaseInvoices")
+
+LINES_SELECT = "LineNum,ItemCode,ItemDescription,Quantity,UnitPrice,LineTotal"
+
+def document_tables(entity):
+    """
+    Devuelve los nombres de tabla SAP (encabezado, líneas) de una entidad de documentos.
+
+    Parameters
+    ----------
+    entity : str
+        Entidad del Service Layer, ej. "CreditNotes".
+
+    Returns
+    -------
+    tuple[str, str]
+        Ej. ("ORIN", "RIN1"). Para entidades no registradas se usa (entity, entity + "Lines").
+    """
+    return DOCUMENT_TABLES.get(entity, (entity, f"{entity}Lines"))
+
+# Respuestas que indican que la variante de URL no está soportada: se pasa a la siguiente
+LINES_FALLBACK_STATUS = (400, 404, 501)
+
+def _unsupported_variant(e):
+    return e.response is not None and e.response.status_code in LINES_FALLBACK_STATUS
+
+def sl_fetch_document_lines(session, base, entity, doc_entry):
+    """
+    Recupera las líneas (DocumentLines) de cualquier documento de marketing de forma robusta.
+
+    Estrategia:
+      1) GET /{entity}(docEntry)/DocumentLines?$select=LineNum,ItemCode,ItemDescription,Quantity,UnitPrice,LineTotal
+      2) GET /{entity}(docEntry)/DocumentLines  (sin $select)
+      3) GET /{entity}(docEntry) y se extrae la key 'DocumentLines'.
+
+    Se pasa a la variante siguiente sólo si la anterior responde 400/404/501
+    (variante no soportada). Otros errores (429/5xx ya reintentados por req_get)
+    se propagan, para no pagar los reintentos de cada variante en cada documento.
+
+    Parameters
+    ----------
+    session : requests.Session
+        Sesión autenticada.
+    base : str
+        URL base del Service Layer (usual: BASE).
+    entity : str
+        Entidad de documentos, ej. "Invoices", "CreditNotes", "Orders".
+    doc_entry : int or str
+        DocEntry del documento a consultar.
+
+    Returns
+    -------
+    list[dict]
+        Lista de líneas del documento.
+    """
+    # Todas las variantes van por req_get: reintentos 429/5xx y hedging (HEDGER)
+    # 1) Con $select (si el Service Layer lo soporta)
+    url1 = f"{base}/{entity}({doc_entry})/DocumentLines?$select={LINES_SELECT}"
+    try:
+        val = req_get(session, url1).json().get("value")
+        if isinstance(val, list):
+            return val
+    except HTTPError as e:
+        if not _unsupported_variant(e):
+            raise
+
+    # 2) Sin $select
+    url2 = f"{base}/{entity}({doc_entry})/DocumentLines"
+    try:
+        val = req_get(session, url2).json().get("value")
+        if isinstance(val, list):
+            return val
+    except HTTPError as e:
+        if not _unsupported_variant(e):
+            raise
+
+    # 3) Documento completo y lectura de DocumentLines
+    url3 = f"{base}/{entity}({doc_entry})"
+    obj = req_get(session, url3).json()
+    lines = obj.get("DocumentLines", [])
+    return lines
+
+def export_document_headers_csv(session, entity, out_path, where=None):
+    """
+    Exporta encabezados de una entidad de documentos a CSV con layout OINV
+    (el mismo para ORIN, ORDR, ODLN, OPCH, ...) y devuelve la lista de documentos
+    para reutilizarla en la exportación de líneas.
+
+    Columns
+    -------
+    DocEntry, DocNum, CardCode, SlpCode, DocDate, DocTotal, VatSum (ver OINV_HEADER).
+
+    Parameters
+    ----------
+    session : requests.Session
+        Sesión autenticada.
+    entity : str
+        Entidad de documentos, ej. "Invoices", "CreditNotes".
+    out_path : str
+        Ruta del CSV de salida.
+    where : str, optional
+        Filtro OData, ej. "DocDate ge 2025-01-01".
+
+    Returns
+    -------
+    list[dict]
+        Lista de documentos recuperados, con los mismos campos que se exportan.
+    """
+    head_table, _ = document_tables(entity)
+    try:
+        total = service_count(session, entity, where=where)
+    except Exception:
+        total = None
+
+    if total is not None:
+        print(f"{entity} reportados por /{entity}/$count:", total)
+
+    t0, written = time.time(), 0
+    docs = []
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+
+    with export_csv(out_path, OINV_HEADER, table=head_table, expected=total, watermark="DocEntry") as w:
+
+        for o in stream_entity(session, entity, select=OINV_SELECT,
+                               orderby="DocEntry", where=where):
+            w.writerow(oinv_row(o))
+            docs.append(o)
+            written += 1
+
+            if written % 2000 == 0:
+                print(f"  -> {written} encabezados {head_table}")
+
+    print(f"✅ {head_table}: {written} filas -> {out_path} ({time.time()-t0:.1f}s)")
+    return docs
+
+def export_document_lines_csv(session, entity, docs, out_path, progress_every=500, max_workers=1):
+    """
+    Exporta las líneas (DocumentLines) de una lista de documentos a CSV con layout INV1.
+
+    Las líneas se piden con sl_fetch_document_lines. Con max_workers > 1 las llamadas
+    por documento se hacen en paralelo, pero el CSV se escribe en el mismo orden que
+    `docs` (DocEntry ascendente si viene de export_document_headers_csv).
+
+    Parameters
+    ----------
+    session : requests.Session
+        Sesión autenticada.
+    entity : str
+        Entidad de documentos, ej. "Invoices", "CreditNotes".
+    docs : list[dict]
+        Documentos devueltos por export_document_headers_csv.
+    out_path : str
+        Ruta del CSV de salida.
+    progress_every : int, optional
+        Frecuencia (en número de documentos) para imprimir progreso.
+    max_workers : int, optional
+        Documentos consultados en paralelo. Por defecto 1 (serie).
+
+    Returns
+    -------
+    int
+        Número de líneas exportadas.
+    """
+    _, lines_table = document_tables(entity)
+    t0, written_docs, written_lines = time.time(), 0, 0
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+
+    def _fetch(o):
+        de = o.get("DocEntry")
+        try:
+            return de, sl_fetch_document_lines(session, BASE, entity, de)
+        except HTTPError as e:
+            print(f"[WARN] {entity} DocEntry {de} sin líneas ({e})")
+        except Exception as e:
+            print(f"[WARN] {entity} DocEntry {de} error: {e}")
+        return de, []
+
+    with export_csv(out_path, INV1_HEADER, table=lines_table, watermark="DocEntry") as w:
+
+        if max_workers > 1:
+            ex = ThreadPoolExecutor(max_workers=max_workers)
+            results = ex.map(_fetch, docs)
+        else:
+            ex = None
+            results = map(_fetch, docs)
+
+        try:
+            for de, lines in results:
+                for l in lines:
+                    w.writerow(inv1_row(de, l))
+                    written_lines += 1
+
+                written_docs += 1
+                if written_docs % progress_every == 0:
+                    print(
+                        f"  -> líneas {lines_table} de {written_docs}/{len(docs)} "
+                        f"documentos (acum {written_lines} líneas)"
+                    )
+        finally:
+            if ex is not None:
+                ex.shutdown()
+
+    print(f"✅ {lines_table}: {written_lines} líneas de {written_docs} documentos -> {out_path} ({time.time()-t0:.1f}s)")
+    return written_lines
+
+def export_documents_csv(session, entity, out_dir=TMPDIR, where=None, lines_workers=1):
+    """
+    Exporta encabezados y líneas de una entidad de documentos a <TABLA>.csv y <TABLA>1.csv
+    (ej. CreditNotes -> ORIN.csv / RIN1.csv).
+
+    Parameters
+    ----------
+    session : requests.Session
+        Sesión autenticada.
+    entity : str
+        Entidad de documentos del Service Layer.
+    out_dir : str, optional
+        Carpeta de salida. Por defecto TMPDIR.
+    where : str, optional
+        Filtro OData común a encabezados.
+    lines_workers : int, optional
+        Paralelismo para las llamadas de líneas por documento.
+
+    Returns
+    -------
+    dict
+        {"entity", "headers", "lines", "header_path", "lines_path"}.
+    """
+    head_table, lines_table = document_tables(entity)
+    header_path = os.path.join(out_dir, f"{head_table}.csv")
+    lines_path = os.path.join(out_dir, f"{lines_table}.csv")
+
+    docs = export_document_headers_csv(session, entity, header_path, where=where)
+    n_lines = export_document_lines_csv(session, entity, docs, lines_path,
+                                        max_workers=lines_workers)
+    return {"entity": entity, "headers": len(docs), "lines": n_lines,
+            "header_path": header_path, "lines_path": lines_path}
+
+def export_all_documents_csv(session, entities=DEFAULT_DOCUMENTS, out_dir=TMPDIR, where=None,
+                             max_workers=None, lines_workers=4):
+    """
+    Exporta varias entidades de documentos de marketing en paralelo dentro del mismo proceso.
+
+    Cada entidad corre en su propio hilo (encabezados + líneas) y comparte la misma
+    lógica de paginación, fallback de líneas y escritura que las facturas. Un fallo
+    en una entidad no detiene a las demás.
+
+    Parameters
+    ----------
+    session : requests.Session
+        Sesión autenticada.
+    entities : Iterable[str], optional
+        Entidades a exportar. Por defecto Invoices, CreditNotes, Orders,
+        DeliveryNotes y PurchaseInvoices.
+    out_dir : str, optional
+        Carpeta de salida.
+    where : str, optional
+        Filtro OData aplicado a todas las entidades (ej. "DocDate ge 2025-01-01").
+    max_workers : int, optional
+        Entidades en paralelo. Por defecto, una por entidad.
+    lines_workers : int, optional
+        Paralelismo de líneas dentro de cada entidad.
+
+    Returns
+    -------
+    dict[str, dict]
+        Resultado de export_documents_csv por entidad; las fallidas incluyen "error".
+    """
+    entities = list(entities)
+    t0 = time.time()
+    results = {}
+    workers = min(max_workers or len(entities), len(entities)) or 1
+    # Cada entidad abre su propio pool de líneas sobre la misma sesión
+    size_session_pool(session, workers * max(1, lines_workers))
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futs = {
+            ex.submit(export_documents_csv, session, e, out_dir, where, lines_workers): e
+            for e in entities
+        }
+        for fut in as_completed(futs):
+            e = futs[fut]
+            try:
+                results[e] = fut.result()
+            except Exception as exc:
+                print(f"[WARN] {e} falló: {exc}")
+                results[e] = {"entity": e, "error": str(exc)}
+
+    ok = sum(1 for r in results.values() if "error" not in r)
+    print(f"✅ Documentos: {ok}/{len(entities)} entidades exportadas ({time.time()-t0:.1f}s)")
+    return results
@@ -5,6 +5,9 @@ def req_get(session, url, timeout=120, **kwargs):
     Se aplican reintentos con backoff exponencial para los códigos:
     429, 500, 502, 503, 504.
 
+    Si el hedging está activo (HEDGER, ver enable_hedging), cada intento puede
+    duplicarse en otra sesión del pool cuando supera el percentil de latencia.
+
     Parameters
     ----------
     session : requests.Session
@@ -27,12 +30,16 @@ def req_get(session, url, timeout=120, **kwargs):
         Si luego de los reintentos la respuesta sigue siendo de error.
     """
     for attempt in range(4):
-        r = session.get(url, timeout=timeout, verify=VERIFY, **kwargs)
+        if HEDGER is not None:
+            r = HEDGER.get(session, url, timeout=timeout, verify=VERIFY, **kwargs)
+        else:
+            r = session.get(url, timeout=timeout, verify=VERIFY, **kwargs)
         if r.status_code < 400:
             return r
 
         if r.status_code in (429, 500, 502, 503, 504):
             # Errores transitorios: backoff exponencial
+            r.close()
             time.sleep(1.5 * (2 ** attempt))
             continue
 
@@ -42,7 +49,181 @@ def req_get(session, url, timeout=120, **kwargs):
     # Si se llega aquí, todos los intentos fallaron
     r.raise_for_status()
 
-def stream_entity(session, entity, select=None, where=None, orderby=None):
+def iter_json_value(chunks, meta=None, key="value"):
+    """
+    Parsea incrementalmente un objeto JSON de página OData y va entregando los
+    elementos del array `key` a medida que llegan los bytes.
+
+    Sólo se mantiene en memoria el fragmento sin procesar (un chunk más, como mucho,
+    el elemento en curso): nunca el cuerpo completo ni la lista decodificada.
+    El resto de claves de primer nivel (odata.nextLink, odata.count, ...) se
+    guardan en `meta`.
+
+    Parameters
+    ----------
+    chunks : Iterable[bytes]
+        Cuerpo de la respuesta en bloques (ej. Response.iter_content()).
+    meta : dict, optional
+        Diccionario que recibe las claves de primer nivel distintas de `key`.
+    key : str, optional
+        Clave del array a recorrer. Por defecto "value".
+
+    Yields
+    ------
+    Any
+        Cada elemento del array (normalmente un dict por registro).
+
+    Raises
+    ------
+    ValueError
+        Si el cuerpo no es un objeto JSON válido.
+    """
+    if meta is None:
+        meta = {}
+    dec = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buf, pos, eof = "", 0, False
+
+    def _fill():
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        data = next(chunks, None)
+        if data is None:
+            eof = True
+            buf, pos = buf[pos:] + utf8.decode(b"", final=True), 0
+            return True
+        buf, pos = buf[pos:] + utf8.decode(data), 0
+        return True
+
+    def _peek():
+        # Siguiente carácter significativo (sin consumirlo); "" al final del cuerpo
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not _fill():
+                return ""
+
+    def _value():
+        # Decodifica un valor completo; pide más bytes mientras esté truncado
+        nonlocal pos
+        _peek()
+        while True:
+            try:
+                val, end = dec.raw_decode(buf, pos)
+                # Un número al borde del buffer puede estar truncado ("-25" de "-2500.5")
+                if eof or (end < len(buf) and buf[end] not in "0123456789.eE+-"):
+                    pos = end
+                    return val
+            except ValueError:
+                if eof:
+                    raise
+            _fill()
+
+    def _expect(ch):
+        nonlocal pos
+        if _peek() != ch:
+            raise ValueError(f"JSON inesperado: se esperaba {ch!r} en la respuesta")
+        pos += 1
+
+    _expect("{")
+    if _peek() == "}":
+        return
+
+    while True:
+        name = _value()
+        _expect(":")
+        if name == key and _peek() == "[":
+            pos += 1
+            if _peek() == "]":
+                pos += 1
+            else:
+                while True:
+                    yield _value()
+                    if _peek() == ",":
+                        pos += 1
+                        continue
+                    _expect("]")
+                    break
+        else:
+            meta[name] = _value()
+
+        if _peek() == ",":
+            pos += 1
+            continue
+        _expect("}")
+        return
+
+def iter_page_rows(session, url, meta, mode=None, **kwargs):
+    """
+    Descarga una página OData con req_get y entrega sus registros ("value").
+
+    Con mode="stream" la respuesta se pide con stream=True y se parsea de forma
+    incremental (iter_json_value); con mode="full" se usa r.json() como siempre.
+    Las claves de primer nivel distintas de "value" se copian a `meta`, de modo
+    que el nextLink está disponible al terminar de iterar.
+
+    Parameters
+    ----------
+    session : requests.Session
+        Sesión autenticada.
+    url : str
+        URL de la página.
+    meta : dict
+        Recibe odata.nextLink y demás claves de la página.
+    mode : str, optional
+        "full" o "stream". Por defecto PARSE_MODE (variable SL_PARSE_MODE).
+    **kwargs :
+        Parámetros adicionales para req_get.
+
+    Yields
+    ------
+    dict
+        Registro de la página.
+    """
+    mode = mode or PARSE_MODE
+    if mode == "stream":
+        r = req_get(session, url, stream=True, **kwargs)
+        try:
+            yield from iter_json_value(r.iter_content(chunk_size=STREAM_CHUNK), meta)
+        finally:
+            r.close()
+        return
+
+    js = req_get(session, url, **kwargs).json()
+    rows = js.pop("value", [])
+    meta.update(js)
+    yield from rows
+
+def next_link_url(meta):
+    """
+    Devuelve la URL absoluta del siguiente bloque (odata.nextLink) o None.
+
+    Parameters
+    ----------
+    meta : dict
+        Claves de primer nivel de la página (ver iter_page_rows).
+
+    Returns
+    -------
+    str or None
+    """
+    nextlink = meta.get("@odata.nextLink") or meta.get("odata.nextLink") or meta.get("nextLink")
+    if not nextlink:
+        return None
+    return nextlink if nextlink.startswith("http") else (BASE.rstrip("/") + "/" + nextlink.lstrip("/"))
+
+def _key_literal(value):
+    """Formatea un valor de clave como literal OData (números tal cual, textos entre comillas)."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+def stream_entity(session, entity, select=None, where=None, orderby=None, consistent=None, stats=None):
     """
     Generador que recorre TODAS las páginas de una entidad OData.
 
@@ -50,6 +231,19 @@ def stream_entity(session, entity, select=None, where=None, orderby=None):
       1) Si el Service Layer devuelve @odata.nextLink, se sigue ese enlace.
       2) Si no hay nextLink, se reconstruye manualmente $skip += len(value).
 
+    El tamaño de página es el ajustado para la entidad (tuned_settings) o PAGESIZE.
+    Con --profile=stream_entity cada llamada se perfila como una etapa (ver profiling.py).
+
+    Capa de consistencia (por defecto activa cuando `orderby` es un solo campo):
+      - En lugar de $skip, cada página siguiente se pide con `<clave> gt <última clave
+        emitida>` (paginación por clave). La comparación la hace el servidor con su
+        propia intercalación, así que las inserciones no repiten filas y los borrados
+        no hacen saltar filas, sin guardar nada más que la última clave.
+      - La clave debe ser única (DocEntry, ItemCode, CardCode...): con un `orderby`
+        repetido las filas con la misma clave en el borde de página se saltarían;
+        en ese caso pasar consistent=False.
+      - Al final se compara el total emitido con service_count y se avisa si difiere.
+
     Parameters
     ----------
     session : requests.Session
@@ -57,48 +251,87 @@ def stream_entity(session, entity, select=None, where=None, orderby=None):
     entity : str
         Nombre de la entidad OData, ej. "Items", "BusinessPartners", "Invoices".
     select : str, optional
-        Campos para $select.
+        Campos para $select (debe incluir la clave de `orderby` para la capa de consistencia).
     where : str, optional
         Filtro $filter.
     orderby : str, optional
         Orden para $orderby.
+    consistent : bool, optional
+        Activa/desactiva la capa de consistencia. Por defecto (None), activa si
+        `orderby` es un solo campo ascendente.
+    stats : dict, optional
+        Si se pasa, recibe "rows", "pages" y "expected".
 
     Yields
     ------
     dict
         Registro devuelto por el servicio.
     """
-    qs = []
-    if select:
-        qs.append(f"$select={select}")
-    if where:
-        qs.append(f"$filter={where}")
-    if orderby:
-        qs.append(f"$orderby={orderby}")
-    qs.append(f"$top={PAGESIZE}")
-    qs.append("$skip=0")
+    with profile_stage("stream_entity", entity):
+        yield from _stream_entity(session, entity, select=select, where=where, orderby=orderby,
+                                  consistent=consistent, stats=stats)
 
-    url = f"{BASE}/{entity}?" + "&".join(qs)
-    total = 0
+def _seek_key(orderby, select, consistent):
+    """Campo para paginar por clave, o None si no aplica (ver stream_entity)."""
+    if consistent is False or not orderby:
+        return None
+    key = orderby.strip()
+    if " " in key or "," in key or (select and key not in select.split(",")):
+        if consistent:
+            print(f"[WARN] capa de consistencia requiere un orderby de un solo campo incluido en "
+                  f"$select ({orderby!r}); se pagina con $skip")
+        return None
+    return key
 
-    while True:
-        r = req_get(session, url)
-        js = r.json()
-        rows = js.get("value", [])
+def _stream_entity(session, entity, select=None, where=None, orderby=None, consistent=None, stats=None):
+    """Implementación de stream_entity (paginación por $skip o por clave)."""
+    pagesize = tuned_settings(session, entity, select=select, where=where)["pagesize"]
+    headers = {"Prefer": f"odata.maxpagesize={pagesize}"}
+    key = _seek_key(orderby, select, consistent)
 
-        for row in rows:
-            yield row
+    def _url(flt, skip):
+        qs = []
+        if select:
+            qs.append(f"$select={select}")
+        if flt:
+            qs.append(f"$filter={flt}")
+        if orderby:
+            qs.append(f"$orderby={orderby}")
+        qs.append(f"$top={pagesize}")
+        qs.append(f"$skip={skip}")
+        return f"{BASE}/{entity}?" + "&".join(qs)
 
-        total += len(rows)
+    url = _url(where, 0)
+    total = pages = 0
+    last = None
+
+    while True:
+        meta, n = {}, 0
+        for row in iter_page_rows(session, url, meta, headers=headers):
+            n += 1
+            if key:
+                k = row.get(key)
+                if k is not None:
+                    last = k
+            total += 1
+            yield row
+        pages += 1
 
         # 1) Intentar nextLink
-        nextlink = js.get("@odata.nextLink") or js.get("odata.nextLink") or js.get("nextLink")
+        nextlink = next_link_url(meta)
+        if key:
+            # Paginación por clave: siguiente página = claves mayores que la última emitida
+            if not n or (n < pagesize and not nextlink) or last is None:
+                break
+            rng = f"{key} gt {_key_literal(last)}"
+            url = _url(f"({where}) and {rng}" if where else rng, 0)
+            continue
         if nextlink:
-            url = nextlink if nextlink.startswith("http") else (BASE.rstrip("/") + "/" + nextlink.lstrip("/"))
+            url = nextlink
             continue
 
         # 2) Sin nextLink, usar skip
-        if not rows:
+        if not n:
             break
 
         base_path, params = url.split("?", 1)
@@ -109,12 +342,25 @@ def stream_entity(session, entity, select=None, where=None, orderby=None):
                     current = int(p.split("=")[1])
                 except Exception:
                     current = 0
-                p = f"$skip={current + len(rows)}"
+                p = f"$skip={current + n}"
             new_params.append(p)
 
         url = base_path + "?" + "&".join(new_params)
 
-def service_count(session, entity):
+    expected = None
+    if key:
+        try:
+            expected = service_count(session, entity, where=where)
+        except Exception:
+            expected = None
+        if expected is not None and expected != total:
+            print(f"[WARN] {entity}: se emitieron {total} filas pero /$count reporta {expected} "
+                  f"(registros creados o borrados durante la lectura)")
+
+    if stats is not None:
+        stats.update(rows=total, pages=pages, expected=expected)
+
+def service_count(session, entity, where=None):
     """
     Obtiene el conteo total de registros de una entidad, usando /$count.
 
@@ -124,13 +370,18 @@ def service_count(session, entity):
         Sesión autenticada.
     entity : str
         Nombre de la entidad (ej. "Items", "Invoices").
+    where : str, optional
+        Filtro $filter, ej. "DocDate ge 2025-01-01". Sin filtro se cuenta toda la entidad.
 
     Returns
     -------
     int or None
         Conteo total de la entidad, o None si la respuesta no se pudo parsear.
     """
-    r = req_get(session, f"{BASE}/{entity}/$count")
+    url = f"{BASE}/{entity}/$count"
+    if where:
+        url += f"?$filter={where}"
+    r = req_get(session, url)
     try:
         return int(r.text)
     except Exception:
@@ -0,0 +1,295 @@
+EXPORT_LAYOUTS = {
+    # Columna: "Campo" -> row.get("Campo", ""); ("Campo", d) -> row.get("Campo") or d; None -> ""
+    "OITB": {
+        "entity": "ItemGroups",
+        "select": "Number,GroupName",
+        "orderby": "Number",
+        "header": ["ItmsGrpCod", "ItmsGrpNam"],
+        "columns": ["Number", "GroupName"],
+    },
+    "OITM": {
+        "entity": "Items",
+        "select": "ItemCode,ItemName,ItemsGroupCode,UpdateDate,CreateDate",
+        "orderby": "ItemCode",
+        "header": ["ItemCode", "ItemName", "ItmsGrpCod", "UpdateDate", "CreateDate"],
+        "columns": ["ItemCode", "ItemName", ("ItemsGroupCode", 0), "UpdateDate", "CreateDate"],
+    },
+    "OSLP": {
+        "entity": "SalesPersons",
+        "select": "SalesEmployeeCode,SalesEmployeeName",
+        "orderby": "SalesEmployeeCode",
+        "header": ["SlpCode", "SlpName"],
+        "columns": ["SalesEmployeeCode", "SalesEmployeeName"],
+    },
+    "OCRD": {
+        "entity": "BusinessPartners",
+        "select": "CardCode,CardName,FederalTaxID,EmailAddress,Phone1,Cellular,UpdateDate,CreateDate",
+        "orderby": "CardCode",
+        "header": ["CardCode", "CardName", "LicTradNum", "E_Mail", "Phone1", "Cellular",
+                   "Address", "U_BirthDate", "UpdateDate", "CreateDate"],
+        "columns": ["CardCode", "CardName", "FederalTaxID", "EmailAddress", "Phone1", "Cellular",
+                    None, None, "UpdateDate", "CreateDate"],
+    },
+    "OINV": {
+        "entity": "Invoices",
+        "select": OINV_SELECT,
+        "orderby": "DocEntry",
+        "header": OINV_HEADER,
+        "columns": ["DocEntry", "DocNum", "CardCode", "SalesPersonCode", "DocDate", "DocTotal", "VatSum"],
+    },
+}
+
+def _column_getters(columns):
+    """Compila las especificaciones de columnas de EXPORT_LAYOUTS a funciones fila -> valor."""
+    getters = []
+    for spec in columns:
+        if spec is None:
+            getters.append(lambda row: "")
+        elif isinstance(spec, tuple):
+            name, default = spec
+            getters.append(lambda row, n=name, d=default: row.get(n) or d)
+        else:
+            getters.append(lambda row, n=spec: row.get(n, ""))
+    return getters
+
+def rows_to_csv_bytes(rows, columns):
+    """
+    Mapea registros del Service Layer a filas CSV y las devuelve codificadas en UTF-8.
+
+    Produce exactamente el mismo formato que csv.writer sobre un archivo abierto con
+    newline="" (terminador "\\r\\n"), por lo que los bloques se pueden concatenar.
+
+    Parameters
+    ----------
+    rows : Iterable[dict]
+        Registros de la página.
+    columns : list
+        Especificación de columnas (ver EXPORT_LAYOUTS).
+
+    Returns
+    -------
+    tuple[bytes, int]
+        (bloque CSV codificado, filas escritas).
+    """
+    getters = _column_getters(columns)
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    n = 0
+    for row in rows:
+        w.writerow([g(row) for g in getters])
+        n += 1
+    return buf.getvalue().encode("utf-8"), n
+
+def decode_page_to_csv(raw, columns):
+    """
+    Worker del pool de procesos: decodifica el JSON crudo de una página y lo
+    transforma en un bloque CSV codificado.
+
+    Se ejecuta en otro proceso: con `fork` hereda el espacio de nombres del
+    notebook; con `spawn`/`forkserver` sólo si este código vive en un módulo
+    importable (ver process_decode_available).
+
+    Parameters
+    ----------
+    raw : bytes
+        Cuerpo de la respuesta tal como llegó del Service Layer.
+    columns : list
+        Especificación de columnas (ver EXPORT_LAYOUTS).
+
+    Returns
+    -------
+    tuple[bytes, int, bool]
+        (bloque CSV codificado, filas de la página, si la página traía nextLink).
+    """
+    js = json.loads(raw)
+    block, n = rows_to_csv_bytes(js.pop("value", []), columns)
+    return block, n, bool(next_link_url(js))
+
+def process_decode_available():
+    """
+    True si decode_page_to_csv puede correr en un ProcessPoolExecutor.
+
+    Con `fork` (Linux hasta Python 3.13) el worker hereda las funciones del
+    notebook. Con `spawn` (Windows, macOS) o `forkserver` (Linux desde 3.14) el
+    worker se reimporta por nombre de módulo, así que sólo funciona si este código
+    está en un módulo importable y no en `__main__` / un notebook.
+    """
+    if multiprocessing.get_start_method() == "fork":
+        return True
+    mod = decode_page_to_csv.__module__
+    return mod != "__main__" and getattr(sys.modules.get(mod), "__spec__", None) is not None
+
+def export_layout_parallel_csv(session, layout, out_path, workers=4, fetch_workers=None,
+                               where=None, pagesize=None):
+    """
+    Exporta una entidad con un pipeline multinúcleo: los hilos descargan páginas
+    crudas y un pool de procesos las decodifica y transforma a CSV.
+
+    - Las páginas se piden por $skip (k * pagesize), así varias se descargan a la vez.
+    - Cada página cruda (bytes) se envía a un worker de ProcessPoolExecutor que hace
+      json.loads, el mapeo de columnas y la codificación CSV.
+    - El proceso principal sólo concatena los bloques en orden de página, por lo que
+      el archivo resultante es idéntico al de los exportadores en serie.
+    - Si los procesos no pueden arrancar (ver process_decode_available), se avisa y
+      se decodifica con un pool de hilos en el proceso principal.
+    - La extracción termina en la primera página con menos de `pagesize` filas.
+
+    Parameters
+    ----------
+    session : requests.Session
+        Sesión autenticada.
+    layout : str
+        Clave de EXPORT_LAYOUTS ("OITB", "OITM", "OSLP", "OCRD", "OINV").
+    out_path : str
+        Ruta del CSV de salida.
+    workers : int, optional
+        Procesos de decodificación/transformación.
+    fetch_workers : int, optional
+        Hilos de descarga. Por defecto, los ajustados para la entidad (tuned_settings)
+        o el doble de `workers`.
+    where : str, optional
+        Filtro OData.
+    pagesize : int, optional
+        Filas por página ($top y odata.maxpagesize). Por defecto la ajustada para la
+        entidad o PAGESIZE.
+
+    Returns
+    -------
+    int
+        Número de filas escritas.
+    """
+    spec = EXPORT_LAYOUTS[layout]
+    tuned = tuned_settings(session, spec["entity"], select=spec["select"], where=where)
+    pagesize = pagesize or tuned["pagesize"]
+    fetch_workers = fetch_workers or tuned["workers"] or 2 * workers
+    window = fetch_workers + workers
+    size_session_pool(session, fetch_workers)
+
+    qs = [f"$select={spec['select']}"]
+    if where:
+        qs.append(f"$filter={where}")
+    qs.append(f"$orderby={spec['orderby']}")
+    qs.append(f"$top={pagesize}")
+    base_url = f"{BASE}/{spec['entity']}?" + "&".join(qs)
+    headers = {"Prefer": f"odata.maxpagesize={pagesize}"}
+
+    t0, written = time.time(), 0
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+
+    in_process = not process_decode_available()
+    if in_process:
+        print(f"[WARN] {layout}: start method '{multiprocessing.get_start_method()}' sin módulo "
+              f"importable; se decodifica en hilos del proceso principal")
+    pool_cls = ThreadPoolExecutor if in_process else ProcessPoolExecutor
+
+    with pool_cls(max_workers=workers) as procs, \
+            ThreadPoolExecutor(max_workers=fetch_workers) as fetchers:
+
+        def _fetch_and_decode(page_no):
+            raw = req_get(session, f"{base_url}&$skip={page_no * pagesize}", headers=headers).content
+            return procs.submit(decode_page_to_csv, raw, spec["columns"]).result()
+
+        with export_csv(out_path, spec["header"], table=layout) as f:
+
+            inflight, next_submit, next_write, last = {}, 0, 0, None
+            while last is None or next_write <= last:
+                while last is None and len(inflight) < window:
+                    inflight[next_submit] = fetchers.submit(_fetch_and_decode, next_submit)
+                    next_submit += 1
+
+                block, n, has_next = inflight.pop(next_write).result()
+                if n < pagesize and has_next:
+                    # El servidor recortó la página (maxpagesize menor): los $skip calculados no sirven
+                    raise ValueError(f"El Service Layer devolvió {n} filas por página con nextLink; "
+                                     f"usar pagesize={n}")
+                f.write_block(block, n)
+                written += n
+                if n < pagesize:
+                    last = next_write
+                next_write += 1
+
+                if next_write % 20 == 0:
+                    print(f"  -> {written} filas en {time.time()-t0:.1f}s")
+
+            for fut in inflight.values():
+                fut.cancel()
+
+    dt = time.time() - t0
+    print(f"✅ {layout} (paralelo, {workers} {'hilos' if in_process else 'procesos'}): {written} filas -> {out_path} "
+          f"({dt:.1f}s, {written / dt if dt else 0:.0f} filas/s)")
+    return written
+
+def synthetic_pages(layout="OITM", pages=40, pagesize=1000):
+    """
+    Genera páginas JSON crudas sintéticas con la forma de una entidad, para
+    medir el pipeline sin tocar el Service Layer.
+
+    Parameters
+    ----------
+    layout : str, optional
+        Clave de EXPORT_LAYOUTS.
+    pages : int, optional
+        Número de páginas.
+    pagesize : int, optional
+        Registros por página.
+
+    Returns
+    -------
+    list[bytes]
+    """
+    fields = [f for f in EXPORT_LAYOUTS[layout]["select"].split(",")]
+    out = []
+    for p in range(pages):
+        rows = []
+        for i in range(pagesize):
+            n = p * pagesize + i
+            rows.append({f: (n if f in ("DocEntry", "DocNum", "Number", "ItemsGroupCode")
+                             else f"{f}-{n:08d} ñandú") for f in fields})
+        out.append(json.dumps({"value": rows, "odata.nextLink": f"x?$skip={n + 1}"}).encode("utf-8"))
+    return out
+
+def benchmark_decode_workers(pages=None, layout="OITM", workers=(1, 2, 4, 8)):
+    """
+    Mide filas/s de la etapa decodificar+transformar+codificar para distintos
+    tamaños del pool de procesos.
+
+    La referencia "en serie" corre en el proceso principal (como los exportadores
+    actuales); el resto usa ProcessPoolExecutor con concatenación en orden.
+
+    Parameters
+    ----------
+    pages : list[bytes], optional
+        Páginas crudas (ej. capturadas del Service Layer). Por defecto synthetic_pages(layout).
+    layout : str, optional
+        Clave de EXPORT_LAYOUTS para el mapeo de columnas.
+    workers : Iterable[int], optional
+        Tamaños de pool a medir.
+
+    Returns
+    -------
+    dict
+        {"serie": filas/s, 1: filas/s, 2: filas/s, ...}
+    """
+    pages = pages if pages is not None else synthetic_pages(layout)
+    columns = EXPORT_LAYOUTS[layout]["columns"]
+    results = {}
+
+    t0 = time.perf_counter()
+    n = sum(decode_page_to_csv(p, columns)[1] for p in pages)
+    results["serie"] = n / (time.perf_counter() - t0)
+    print(f"  serie      : {results['serie']:>12,.0f} filas/s")
+
+    if not process_decode_available():
+        print(f"[WARN] start method '{multiprocessing.get_start_method()}' sin módulo importable; "
+              f"sólo se mide la referencia en serie")
+        return results
+
+    for k in workers:
+        with ProcessPoolExecutor(max_workers=k) as ex:
+            list(ex.map(decode_page_to_csv, pages[:k], [columns] * k))  # arranque de workers
+            t0 = time.perf_counter()
+            n = sum(b[1] for b in ex.map(decode_page_to_csv, pages, [columns] * len(pages)))
+            results[k] = n / (time.perf_counter() - t0)
+        print(f"  {k:>2} workers : {results[k]:>12,.0f} filas/s")
+
+    return results
@@ -21,6 +21,10 @@ def stream_items(s):
     Genera todos los códigos de artículo (ItemCode) existentes en SAP B1,
     sin repeticiones, usando paginación.
 
+    Usa la capa de consistencia de stream_entity (paginación por ItemCode): las
+    inserciones o borrados durante el recorrido no repiten ni saltan códigos, con
+    memoria constante (sólo la última clave emitida).
+
     Parameters
     ----------
     s : requests.Session
@@ -31,41 +35,10 @@ def stream_items(s):
     str
         ItemCode único.
     """
-    url = f"{BASE}/Items?$select=ItemCode&$top={PAGESIZE}&$skip=0&$orderby=ItemCode"
-    total = 0
-    seen = set()
-
-    while True:
-        js = req_get(s, url).json()
-        rows = js.get("value", [])
-
-        for r in rows:
-            code = r.get("ItemCode")
-            if code and code not in seen:
-                seen.add(code)
-                yield code
-
-        total += len(rows)
-
-        nextlink = js.get("@odata.nextLink") or js.get("odata.nextLink") or js.get("nextLink")
-        if nextlink:
-            url = nextlink if nextlink.startswith("http") else (BASE.rstrip("/") + "/" + nextlink.lstrip("/"))
-            continue
-
-        if not rows:
-            break
-
-        base_path, params = url.split("?", 1)
-        parts = []
-        for p in params.split("&"):
-            if p.startswith("$skip="):
-                try:
-                    cur = int(p.split("=")[1])
-                except Exception:
-                    cur = 0
-                p = f"$skip={cur + len(rows)}"
-            parts.append(p)
-        url = base_path + "?" + "&".join(parts)
+    for r in stream_entity(s, "Items", select="ItemCode", orderby="ItemCode"):
+        code = r.get("ItemCode")
+        if code:
+            yield code
 
 def fetch_item_price(s, code, pricelist_no):
     """
@@ -138,13 +111,14 @@ def fetch_item_price(s, code, pricelist_no):
     # 3) Sin precio
     return (code, None, None)
 
-def export_prices_csv(s, pricelist_no, out_path, max_workers=16, progress_every=2000):
+def export_prices_csv(s, pricelist_no, out_path, max_workers=None, progress_every=2000, store_path=None):
     """
     Exporta los precios de todos los ítems para una lista de precios específica.
 
     - Recorre todos los ItemCode via stream_items.
     - Usa concurrencia (ThreadPoolExecutor) para consultar precios en paralelo.
-    - Escribe un CSV con un registro por ítem, para la lista indicada.
+    - Escribe un CSV con un registro por ítem, para la lista indicada, en orden de
+      ItemCode (mismo contenido -> mismo hash en el manifiesto).
 
     Columns
     -------
@@ -162,28 +136,40 @@ def export_prices_csv(s, pricelist_no, out_path, max_workers=16, progress_every=
     out_path : str
         Ruta del CSV de salida.
     max_workers : int, optional
-        Número de workers en el ThreadPoolExecutor.
+        Número de workers en el ThreadPoolExecutor. Por defecto el ajustado con
+        tune_price_workers (SL_AUTOTUNE=true lo ajusta en la primera ejecución) o 16.
     progress_every : int, optional
         Cada cuántos ítems escribir una línea de progreso.
+    store_path : str, optional
+        Si se indica (o SL_LOOKUP_STORE), al terminar se actualiza y publica el store
+        SQLite de consulta del POS con esta lista de precios (update_lookup_store).
 
     Returns
     -------
     str
         Ruta del archivo CSV generado.
     """
+    if max_workers is None:
+        max_workers = tuned_settings(None, "ItemPrices")["workers"]
+        if max_workers is None and AUTOTUNE:
+            max_workers = tune_price_workers(s, pricelist_no).get("workers")
+        max_workers = max_workers or 16
+    size_session_pool(s, max_workers)
+
     codes = list(stream_items(s))
     t0 = time.time()
     wrote = 0
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
 
-    with open(out_path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["ItemCode", "PriceList", "Price", "Currency"])
+    with export_csv(out_path, ["ItemCode", "PriceList", "Price", "Currency"],
+                    table=f"PRICES_PL{pricelist_no}", expected=len(codes), stage="prices") as w:
 
         with ThreadPoolExecutor(max_workers=max_workers) as ex:
             futs = [ex.submit(fetch_item_price, s, c, pricelist_no) for c in codes]
 
-            for i, fut in enumerate(as_completed(futs), 1):
+            # Se escribe en el orden de `codes` (no as_completed): el archivo y su
+            # sha256 en el manifiesto sólo cambian si cambian los precios
+            for fut in futs:
                 try:
                     code, price, curr = fut.result()
                 except Exception:
@@ -205,4 +191,9 @@ def export_prices_csv(s, pricelist_no, out_path, max_workers=16, progress_every=
                     print(f"  -> {wrote} items procesados en {time.time()-t0:.1f}s")
 
     print(f"✅ Precios exportados: {wrote} filas -> {out_path}")
+    print_cache_stats()
+    print_transport_stats()
+    store_path = store_path or LOOKUP_STORE
+    if store_path:
+        update_lookup_store(store_path, prices=(pricelist_no, out_path))
     return out_path
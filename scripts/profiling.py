@@ -0,0 +1,222 @@
+PROFILE_STAGES = ("stream_entity", "export", "prices", "stock")
+
+def profiling_enabled(stage):
+    """True si la etapa está seleccionada con --profile / SL_PROFILE."""
+    if not PROFILE:
+        return False
+    wanted = [s.strip() for s in PROFILE.split(",")]
+    return "all" in wanted or stage in wanted
+
+def current_rss_mb():
+    """
+    RSS actual del proceso en MB (Linux, vía /proc/self/statm).
+
+    A diferencia de peak_rss_mb (pico del proceso completo), permite medir el pico
+    de cada etapa/entidad. En otras plataformas devuelve peak_rss_mb().
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_mb()
+
+class StackSampler(threading.Thread):
+    """
+    Muestreador de pilas: cada `interval` segundos toma la pila de todos los hilos
+    (sys._current_frames) y acumula conteos en formato "collapsed"
+    (hilo;func (archivo:línea);... N), listo para flamegraph.pl o speedscope.
+
+    Las llamadas en C (dict.get, csv.writer.writerow, json.loads) se atribuyen a la
+    línea Python que las invoca, así se distinguen el mapeo con row.get y la
+    escritura CSV dentro del mismo bucle. Cubre también los hilos de los pools
+    (fetch_item_price), que cProfile no ve.
+
+    También registra el pico de RSS de la etapa y, si tracemalloc está activo, toma
+    un snapshot cada vez que la memoria trazada supera el máximo anterior.
+    """
+
+    def __init__(self, interval=0.005, snapshot_every=0.25):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.snapshot_every = snapshot_every
+        self.stacks = {}
+        self.samples = 0
+        self.peak_rss = current_rss_mb() or 0.0
+        self.peak_traced = 0
+        self.peak_snapshot = None
+        self._stop_event = threading.Event()
+
+    def _collapse(self, frame, thread_name):
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        parts.append(thread_name)
+        return ";".join(reversed(parts))
+
+    def run(self):
+        me = threading.get_ident()
+        next_snapshot = time.monotonic()
+        while not self._stop_event.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me or names.get(ident) == self.name:
+                    continue
+                key = self._collapse(frame, names.get(ident, str(ident)))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+            now = time.monotonic()
+            if now >= next_snapshot:
+                next_snapshot = now + self.snapshot_every
+                self.peak_rss = max(self.peak_rss, current_rss_mb() or 0.0)
+                if tracemalloc.is_tracing():
+                    traced = tracemalloc.get_traced_memory()[0]
+                    if traced > self.peak_traced * 1.1:
+                        self.peak_traced = traced
+                        self.peak_snapshot = tracemalloc.take_snapshot()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.peak_rss = max(self.peak_rss, current_rss_mb() or 0.0)
+
+    def write_collapsed(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in sorted(self.stacks.items(), key=lambda kv: -kv[1]):
+                f.write(f"{stack} {n}\n")
+
+class _NoProfile:
+    """Etapa sin perfilado: __enter__/__exit__ vacíos (costo casi nulo)."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_PROFILE = _NoProfile()
+_PROFILER_LOCK = threading.Lock()
+# Etapas activas que usan tracemalloc: sólo la última en salir lo detiene
+_TRACE_LOCK = threading.Lock()
+_TRACE_STATE = {"stages": 0, "owned": False}
+
+class ProfileStage:
+    """
+    Perfila una etapa (con cProfile, muestreo de pilas y tracemalloc) y escribe en
+    PROFILE_DIR:
+
+      <etapa>-<etiqueta>-<hora>-<n>.prof       estadísticas de cProfile (pstats / snakeviz)
+      <etapa>-<etiqueta>-<hora>-<n>.collapsed  pilas muestreadas para flamegraph
+      <etapa>-<etiqueta>-<hora>-<n>.alloc.txt  top-N de asignaciones en el pico de memoria
+
+    cProfile sólo admite un perfilador activo por proceso: en etapas anidadas
+    (stream_entity dentro de export) o en hilos paralelos sólo la primera usa
+    cProfile; el muestreo de pilas y tracemalloc funcionan en todas. tracemalloc
+    se comparte: lo inicia la primera etapa activa y lo detiene la última en salir.
+    """
+
+    def __init__(self, stage, label=None):
+        self.stage = stage
+        self.label = label
+        self.profiler = None
+        self.sampler = None
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        with _TRACE_LOCK:
+            if _TRACE_STATE["stages"] == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(PROFILE_TRACE_DEPTH)
+                _TRACE_STATE["owned"] = True
+            _TRACE_STATE["stages"] += 1
+        self.sampler = StackSampler()
+        self.sampler.start()
+        if _PROFILER_LOCK.acquire(blocking=False):
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        if self.profiler is not None:
+            self.profiler.disable()
+            _PROFILER_LOCK.release()
+        self.sampler.stop()
+        seconds = time.perf_counter() - self.t0
+        with _TRACE_LOCK:
+            tracing = tracemalloc.is_tracing()
+            traced_peak = tracemalloc.get_traced_memory()[1] if tracing else 0
+            snapshot = self.sampler.peak_snapshot or (tracemalloc.take_snapshot() if tracing else None)
+            _TRACE_STATE["stages"] -= 1
+            if _TRACE_STATE["stages"] == 0 and _TRACE_STATE["owned"]:
+                tracemalloc.stop()
+                _TRACE_STATE["owned"] = False
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S')}-{len(PROFILE_REPORT):03d}"
+        name = "-".join(p for p in (self.stage, self.label, stamp) if p)
+        base = os.path.join(PROFILE_DIR, name.replace("/", "_"))
+
+        self.sampler.write_collapsed(base + ".collapsed")
+        with open(base + ".alloc.txt", "w", encoding="utf-8") as f:
+            f.write(f"Top {PROFILE_TOP} asignaciones ({self.stage} {self.label or ''}), "
+                    f"pico trazado {traced_peak / (1024 * 1024):.1f} MB\n")
+            for st in (snapshot.statistics("lineno")[:PROFILE_TOP] if snapshot is not None else []):
+                f.write(f"{st.size / 1024:>10.1f} KiB {st.count:>8} bloques  {st.traceback[0]}\n")
+
+        top = []
+        if self.profiler is not None:
+            self.profiler.dump_stats(base + ".prof")
+            ps = pstats.Stats(self.profiler)
+            ranked = sorted(ps.stats.items(), key=lambda kv: -kv[1][2])  # tiempo propio
+            for (filename, line, func), (_, ncalls, tottime, cumtime, _) in ranked[:5]:
+                top.append(f"{func} ({os.path.basename(filename)}:{line}) {tottime:.2f}s/{ncalls}")
+
+        entry = {
+            "stage": self.stage,
+            "label": self.label,
+            "seconds": round(seconds, 3),
+            "peak_rss_mb": round(self.sampler.peak_rss, 1),
+            "traced_peak_mb": round(traced_peak / (1024 * 1024), 2),
+            "samples": self.sampler.samples,
+            "files": base,
+        }
+        PROFILE_REPORT.append(entry)
+        print(f"[PROFILE] {self.stage} {self.label or ''}: {seconds:.1f}s, pico RSS {entry['peak_rss_mb']} MB, "
+              f"pico tracemalloc {entry['traced_peak_mb']} MB -> {base}.*")
+        for t in top:
+            print(f"    {t}")
+        return False
+
+def profile_stage(stage, label=None):
+    """
+    Context manager para perfilar una etapa si está activa con --profile / SL_PROFILE.
+
+    Con el perfilado apagado devuelve un objeto vacío compartido, por lo que el costo
+    es una llamada y una comparación por etapa (no por fila).
+
+    Parameters
+    ----------
+    stage : str
+        Una de PROFILE_STAGES ("stream_entity", "export", "prices", "stock").
+    label : str, optional
+        Entidad o tabla (ej. "Items", "OINV"); se usa en el nombre de los archivos.
+
+    Examples
+    --------
+    >>> with profile_stage("export", "OITM"):
+    ...     export_all_items_csv(session, out_path)
+    """
+    if not PROFILE or not profiling_enabled(stage):
+        return _NO_PROFILE
+    return ProfileStage(stage, label)
+
+def print_profile_report():
+    """Resume las etapas perfiladas: tiempo y picos de memoria por etapa/entidad."""
+    if not PROFILE_REPORT:
+        return
+    print("Perfil por etapa:")
+    for e in PROFILE_REPORT:
+        print(f"  {e['stage']:<14} {e['label'] or '':<20} {e['seconds']:>8.1f}s  "
+              f"RSS {e['peak_rss_mb']:>8.1f} MB  tracemalloc {e['traced_peak_mb']:>8.1f} MB")
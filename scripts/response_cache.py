@@ -0,0 +1,251 @@
+# TTL (segundos) por entidad cacheable; "Entidad(key)" = lectura por clave, ej. Items('A0001')
+CACHE_TTLS = {
+    "ItemGroups": 24 * 3600,
+    "SalesPersons": 24 * 3600,
+    "PriceLists": 24 * 3600,
+    "Warehouses": 24 * 3600,
+    "Items(key)": 15 * 60,
+}
+
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key         TEXT PRIMARY KEY,
+    entity      TEXT NOT NULL,
+    status      INTEGER NOT NULL,
+    headers     TEXT NOT NULL,
+    body        BLOB NOT NULL,
+    raw_length  INTEGER NOT NULL,
+    size        INTEGER NOT NULL,
+    validator   TEXT,
+    expires_at  REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access);
+CREATE TABLE IF NOT EXISTS meta (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+def cache_entity(url):
+    """
+    Entidad de una URL para elegir el TTL: el primer segmento después de la
+    raíz del servicio ("ItemGroups", "PriceLists"...), o "Items(key)" para
+    lecturas por clave. None si la URL no es cacheable.
+    """
+    path = urlsplit(url).path
+    root = urlsplit(BASE or "").path.rstrip("/")
+    if root and path.startswith(root + "/"):
+        path = path[len(root) + 1:]
+    seg = path.lstrip("/").split("/", 1)[0]
+    name = seg.split("(", 1)[0] + "(key)" if "(" in seg else seg
+    return name if name in CACHE_TTLS else None
+
+# Al pasar de max_bytes se descarta hasta quedar en esta fracción, de a lotes
+CACHE_LOW_WATER = 0.9
+CACHE_EVICT_BATCH = 64
+
+class ResponseCache:
+    """
+    Cache persistente de respuestas GET del Service Layer, compartida por todos
+    los scripts (un archivo SQLite en `folder`).
+
+    - Sólo se cachean las entidades de CACHE_TTLS, cada una con su TTL.
+    - Vencido el TTL, si la respuesta traía ETag o Last-Modified se revalida
+      con If-None-Match / If-Modified-Since: un 304 renueva la entrada sin
+      descargar el cuerpo.
+    - Cuerpos comprimidos con zlib; al pasar de `max_mb` se descartan las
+      entradas usadas hace más tiempo (LRU), de a lotes, hasta bajar a
+      CACHE_LOW_WATER del máximo. El tamaño total se lleva en la tabla `meta`
+      (compartida entre procesos), sin recorrer `responses` en cada inserción.
+    - La clave incluye servidor, COMPANY, URL y el header Prefer (tamaño de página).
+
+    Parameters
+    ----------
+    folder : str
+        Carpeta del cache (CACHE_DIR).
+    max_mb : float
+        Tamaño máximo de los cuerpos guardados (comprimidos).
+    """
+
+    def __init__(self, folder, max_mb):
+        self.folder = folder
+        self.path = os.path.join(folder, "cache.sqlite")
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "stored": 0,
+                      "evicted": 0, "bytes_saved": 0}
+        os.makedirs(folder, exist_ok=True)
+        self.con = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.executescript(CACHE_SCHEMA)
+        with self.con:
+            # Sólo la primera vez (caches creados antes de `meta`) se suma la tabla
+            self.con.execute("INSERT OR IGNORE INTO meta VALUES ('total_size', "
+                             "(SELECT COALESCE(SUM(size), 0) FROM responses))")
+
+    def key(self, request):
+        sp = urlsplit(request.url)
+        return f"{COMPANY}|{sp.netloc}|{traffic_key(request.url)}|{request.headers.get('Prefer', '')}"
+
+    def lookup(self, key):
+        """(status, headers, body, validator, vigente) de `key`, o None."""
+        with self._lock:
+            row = self.con.execute(
+                "SELECT status, headers, body, validator, expires_at FROM responses WHERE key = ?",
+                (key,)).fetchone()
+        if row is None:
+            return None
+        status, headers, body, validator, expires_at = row
+        return status, json.loads(headers), zlib.decompress(body), validator, time.time() < expires_at
+
+    def touch(self, key, ttl=None):
+        """Marca el uso (LRU) y, con `ttl`, renueva el vencimiento (tras un 304)."""
+        now = time.time()
+        with self._lock, self.con:
+            if ttl is None:
+                self.con.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            else:
+                self.con.execute("UPDATE responses SET last_access = ?, expires_at = ? WHERE key = ?",
+                                 (now, now + ttl, key))
+
+    def store(self, key, entity, status, headers, body):
+        """Guarda una respuesta 200 y aplica el límite de tamaño."""
+        data = zlib.compress(body, 6)
+        keep = {h: headers[h] for h in TrafficArchive.KEEP_HEADERS if h in headers}
+        validator = json.dumps({h: headers[h] for h in ("ETag", "Last-Modified") if h in headers}) \
+            if ("ETag" in headers or "Last-Modified" in headers) else None
+        now = time.time()
+        with self._lock, self.con:
+            # Primero descuenta la entrada que se reemplaza; el UPDATE abre la
+            # transacción de escritura, así el total no se desfasa entre procesos
+            self.con.execute(
+                "UPDATE meta SET value = value - COALESCE((SELECT size FROM responses WHERE key = ?), 0) "
+                "WHERE name = 'total_size'", (key,))
+            self.con.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, entity, status, json.dumps(keep), data, len(body), len(data), validator,
+                 now + CACHE_TTLS[entity], now))
+            self.con.execute("UPDATE meta SET value = value + ? WHERE name = 'total_size'", (len(data),))
+            self.stats["stored"] += 1
+            total = self.con.execute("SELECT value FROM meta WHERE name = 'total_size'").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(total, int(self.max_bytes * CACHE_LOW_WATER))
+
+    def _evict(self, total, target):
+        """Descarta entradas LRU de a lotes hasta que el total baje de `target`."""
+        freed = 0
+        while total - freed > target:
+            batch = self.con.execute("SELECT key, size FROM responses ORDER BY last_access LIMIT ?",
+                                     (CACHE_EVICT_BATCH,)).fetchall()
+            if not batch:
+                break
+            drop = []
+            for key, size in batch:
+                if total - freed <= target:
+                    break
+                drop.append((key,))
+                freed += size
+            self.con.executemany("DELETE FROM responses WHERE key = ?", drop)
+            self.stats["evicted"] += len(drop)
+        self.con.execute("UPDATE meta SET value = value - ? WHERE name = 'total_size'", (freed,))
+
+    def clear(self, entity=None):
+        """Borra todo el cache o sólo las respuestas de una entidad."""
+        with self._lock, self.con:
+            if entity is None:
+                self.con.execute("DELETE FROM responses")
+                self.con.execute("UPDATE meta SET value = 0 WHERE name = 'total_size'")
+            else:
+                self.con.execute(
+                    "UPDATE meta SET value = value - (SELECT COALESCE(SUM(size), 0) FROM responses "
+                    "WHERE entity = ?) WHERE name = 'total_size'", (entity,))
+                self.con.execute("DELETE FROM responses WHERE entity = ?", (entity,))
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.stats[name] += n
+
+    def close(self):
+        self.con.close()
+
+def cached_send(adapter_send, request, **kwargs):
+    """
+    Atiende un GET desde RESPONSE_CACHE o lo envía con `adapter_send` (SLAdapter).
+
+    Fresco -> respuesta del cache, sin red. Vencido con validador -> GET
+    condicional; un 304 se convierte en la respuesta cacheada (status 200).
+    Sin entrada -> GET normal y se guarda si es 200.
+    """
+    cache = RESPONSE_CACHE
+    entity = cache_entity(request.url)
+    if entity is None:
+        return adapter_send(request, **kwargs)
+
+    key = cache.key(request)
+    found = cache.lookup(key)
+    if found is not None:
+        status, headers, body, validator, fresh = found
+        if fresh:
+            cache.touch(key)
+            cache.count("hits")
+            cache.count("bytes_saved", len(body))
+            return _replay_response(request, status, headers, body)
+        if validator:
+            v = json.loads(validator)
+            if "ETag" in v:
+                request.headers["If-None-Match"] = v["ETag"]
+            if "Last-Modified" in v:
+                request.headers["If-Modified-Since"] = v["Last-Modified"]
+
+    r = adapter_send(request, **kwargs)
+    if r.status_code == 304 and found is not None:
+        r.close()
+        cache.touch(key, ttl=CACHE_TTLS[entity])
+        cache.count("revalidated")
+        cache.count("bytes_saved", len(found[2]))
+        return _replay_response(request, found[0], found[1], found[2])
+
+    cache.count("misses")
+    if r.status_code == 200:
+        cache.store(key, entity, r.status_code, r.headers, r.content)
+    return r
+
+def start_response_cache(folder=None, max_mb=None):
+    """
+    Activa el cache de respuestas para todas las sesiones (ver ResponseCache).
+
+    Parameters
+    ----------
+    folder : str, optional
+        Carpeta del cache. Por defecto CACHE_DIR (SL_CACHE_DIR).
+    max_mb : float, optional
+        Tamaño máximo. Por defecto CACHE_MAX_MB (SL_CACHE_MAX_MB).
+
+    Returns
+    -------
+    ResponseCache
+    """
+    global RESPONSE_CACHE
+    stop_response_cache()
+    RESPONSE_CACHE = ResponseCache(folder or CACHE_DIR, max_mb or CACHE_MAX_MB)
+    return RESPONSE_CACHE
+
+def stop_response_cache():
+    """Imprime las estadísticas y desactiva el cache de respuestas."""
+    global RESPONSE_CACHE
+    if RESPONSE_CACHE is not None:
+        print_cache_stats()
+        RESPONSE_CACHE.close()
+    RESPONSE_CACHE = None
+
+def print_cache_stats():
+    """Imprime tasa de aciertos del cache y bytes que no hubo que descargar."""
+    if RESPONSE_CACHE is None:
+        return
+    st = RESPONSE_CACHE.stats
+    served = st["hits"] + st["revalidated"]
+    total = served + st["misses"]
+    rate = 100 * served / total if total else 0.0
+    print(f"Cache SL: {served}/{total} respuestas desde cache ({rate:.1f}%; {st['revalidated']} revalidadas "
+          f"con 304) | {st['bytes_saved']:,} bytes ahorrados | {st['evicted']} descartadas por tamaño")
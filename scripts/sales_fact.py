@@ -0,0 +1,349 @@
+SALES_FACT_HEADER = [
+    "DocEntry", "DocNum", "DocDate", "LineNum",
+    "CardCode", "CardName", "LicTradNum",
+    "SlpCode", "SlpName",
+    "ItemCode", "Dscription", "ItemName", "ItmsGrpCod", "ItmsGrpNam",
+    "Quantity", "Price", "LineTotal",
+]
+
+SORT_CHUNK_ROWS = 200_000
+
+def _int_key(v):
+    """Clave numérica tolerante a vacíos para DocEntry / LineNum."""
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        return 0
+
+def read_csv_rows(path):
+    """
+    Abre un CSV exportado y devuelve su encabezado y un iterador de filas (listas).
+
+    Si la salida se exportó en shards (ver export_csv), se leen los shards en orden
+    como si fueran un solo archivo.
+
+    Parameters
+    ----------
+    path : str
+        Ruta del CSV (la ruta lógica, también para salidas en shards).
+
+    Returns
+    -------
+    tuple[dict[str, int], Iterator[list[str]]]
+        Índice columna -> posición y generador de filas. El archivo se cierra al
+        agotar el generador.
+    """
+    paths = [p for p in shard_files(path)[0] if p != path] or [path]
+    f = open(paths[0], newline="", encoding="utf-8")
+    rd = csv.reader(f)
+    header = next(rd, [])
+    cols = {name: i for i, name in enumerate(header)}
+
+    def _rows():
+        nonlocal f, rd
+        try:
+            yield from rd
+            for p in paths[1:]:
+                f.close()
+                f = open(p, newline="", encoding="utf-8")
+                rd = csv.reader(f)
+                next(rd, None)
+                yield from rd
+        finally:
+            f.close()
+
+    return cols, _rows()
+
+def load_code_index(path, key, value):
+    """
+    Carga una dimensión pequeña (OITB, OSLP) como índice hash compacto código -> nombre.
+
+    Los textos se internan para que los nombres repetidos compartan memoria.
+    Acepta el CSV lógico aunque esté partido en shards (SL_SHARD_ROWS/SL_SHARD_MB).
+
+    Parameters
+    ----------
+    path : str
+        CSV de la dimensión.
+    key : str
+        Columna clave, ej. "ItmsGrpCod".
+    value : str
+        Columna a devolver, ej. "ItmsGrpNam".
+
+    Returns
+    -------
+    dict[str, str]
+    """
+    if not path or not (os.path.exists(path) or shard_files(path)[0]):
+        return {}
+    cols, rows = read_csv_rows(path)
+    ki, vi = cols[key], cols[value]
+    return {sys.intern(r[ki]): sys.intern(r[vi]) for r in rows}
+
+def external_sort(rows, key, chunk_rows=SORT_CHUNK_ROWS, tmpdir=None):
+    """
+    Ordena un flujo de filas con memoria acotada (sort externo).
+
+    Acumula hasta `chunk_rows` filas, las ordena en memoria y las vuelca a un run
+    temporal en disco; al final combina los runs con heapq.merge. Si el flujo cabe
+    en un solo bloque no se escribe nada a disco.
+
+    Parameters
+    ----------
+    rows : Iterable[list[str]]
+        Filas a ordenar.
+    key : callable
+        Función de clave de orden.
+    chunk_rows : int, optional
+        Máximo de filas en memoria.
+    tmpdir : str, optional
+        Carpeta para los runs. Por defecto TMPDIR.
+
+    Yields
+    ------
+    list[str]
+        Filas en orden de `key`.
+    """
+    with tempfile.TemporaryDirectory(dir=tmpdir or TMPDIR, prefix="sort_") as d:
+        runs, buf = [], []
+
+        def _spill():
+            buf.sort(key=key)
+            path = os.path.join(d, f"run{len(runs):05d}.csv")
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerows(buf)
+            runs.append(path)
+            buf.clear()
+
+        for row in rows:
+            buf.append(row)
+            if len(buf) >= chunk_rows:
+                _spill()
+
+        if not runs:
+            buf.sort(key=key)
+            yield from buf
+            return
+
+        if buf:
+            _spill()
+
+        files = [open(p, newline="", encoding="utf-8") for p in runs]
+        try:
+            yield from heapq.merge(*(csv.reader(f) for f in files), key=key)
+        finally:
+            for f in files:
+                f.close()
+
+def is_sorted_csv(path, key):
+    """
+    Verifica en streaming si un CSV ya está ordenado según `key` (orden de Python).
+
+    El $orderby del Service Layer usa la intercalación de la base de datos, que no
+    siempre coincide con la comparación de strings de Python; el merge-join sólo
+    confía en el orden del archivo si esta verificación pasa.
+
+    Parameters
+    ----------
+    path : str
+        CSV a verificar.
+    key : callable
+        Función de clave sobre la fila.
+
+    Returns
+    -------
+    bool
+    """
+    _, rows = read_csv_rows(path)
+    prev = None
+    for row in rows:
+        k = key(row)
+        if prev is not None and k < prev:
+            rows.close()
+            return False
+        prev = k
+    return True
+
+def sorted_csv_rows(path, key, chunk_rows=SORT_CHUNK_ROWS):
+    """
+    Devuelve (columnas, filas ordenadas por `key`) de un CSV, reordenándolo sólo si hace falta.
+
+    Parameters
+    ----------
+    path : str
+        CSV de entrada.
+    key : callable
+        Función de clave que recibe (columnas) y devuelve la función sobre la fila.
+    chunk_rows : int, optional
+        Filas en memoria para el sort externo.
+
+    Returns
+    -------
+    tuple[dict[str, int], Iterator[list[str]]]
+    """
+    cols, rows = read_csv_rows(path)
+    kf = key(cols)
+    if is_sorted_csv(path, kf):
+        return cols, rows
+    print(f"  -> {os.path.basename(path)} no está ordenado; aplicando sort externo")
+    return cols, external_sort(rows, kf, chunk_rows)
+
+def merge_join(left, left_key, right, right_key):
+    """
+    Left join en streaming entre dos flujos ordenados por la misma clave.
+
+    El lado derecho (dimensión) debe tener claves únicas. Memoria O(1).
+
+    Parameters
+    ----------
+    left : Iterable[list]
+        Filas del lado izquierdo (hechos), ordenadas por left_key.
+    left_key : callable
+        Clave del lado izquierdo.
+    right : Iterable[list]
+        Filas del lado derecho (dimensión), ordenadas por right_key.
+    right_key : callable
+        Clave del lado derecho.
+
+    Yields
+    ------
+    tuple[list, list or None]
+        (fila izquierda, fila derecha coincidente o None).
+    """
+    right = iter(right)
+    cur = next(right, None)
+    ck = right_key(cur) if cur is not None else None
+
+    for row in left:
+        k = left_key(row)
+        while cur is not None and ck < k:
+            cur = next(right, None)
+            ck = right_key(cur) if cur is not None else None
+        yield row, (cur if cur is not None and ck == k else None)
+
+def build_sales_fact_csv(out_path=None, oinv_path=None, inv1_path=None, oitm_path=None,
+                         ocrd_path=None, oslp_path=None, oitb_path=None,
+                         chunk_rows=SORT_CHUNK_ROWS, order_by_document=True):
+    """
+    Construye un archivo de hechos de ventas desnormalizado (INV1 + OINV + OITM + OCRD
+    + OSLP + OITB) directamente desde los CSV exportados, con memoria acotada.
+
+    Etapas:
+      1) OITB y OSLP (dimensiones chicas) se cargan como índices hash código -> nombre.
+      2) INV1 ⋈ OINV por DocEntry: merge-join, ambos salen de los exportadores en orden.
+      3) Sort externo por ItemCode y merge-join con OITM (ordenado por ItemCode).
+      4) Sort externo por CardCode y merge-join con OCRD (ordenado por CardCode).
+      5) Opcionalmente, sort externo final por (DocEntry, LineNum).
+
+    Ninguna etapa mantiene en memoria más de `chunk_rows` filas de hechos; las
+    dimensiones grandes sólo se recorren una vez. Las líneas sin coincidencia en una
+    dimensión se conservan con esas columnas vacías (left join).
+
+    Columns
+    -------
+    Ver SALES_FACT_HEADER.
+
+    Parameters
+    ----------
+    out_path : str, optional
+        CSV de salida. Por defecto TMPDIR/SALES_FACT.csv.
+    oinv_path, inv1_path, oitm_path, ocrd_path, oslp_path, oitb_path : str, optional
+        CSV de entrada; por defecto los de TMPDIR (OINV.csv, INV1.csv, ...).
+    chunk_rows : int, optional
+        Filas en memoria por run del sort externo.
+    order_by_document : bool, optional
+        Reordenar la salida por (DocEntry, LineNum). Si es False queda ordenada por CardCode.
+
+    Returns
+    -------
+    int
+        Número de filas escritas.
+    """
+    out_path = out_path or os.path.join(TMPDIR, "SALES_FACT.csv")
+    oinv_path = oinv_path or os.path.join(TMPDIR, "OINV.csv")
+    inv1_path = inv1_path or os.path.join(TMPDIR, "INV1.csv")
+    oitm_path = oitm_path or os.path.join(TMPDIR, "OITM.csv")
+    ocrd_path = ocrd_path or os.path.join(TMPDIR, "OCRD.csv")
+    oslp_path = oslp_path or os.path.join(TMPDIR, "OSLP.csv")
+    oitb_path = oitb_path or os.path.join(TMPDIR, "OITB.csv")
+
+    t0 = time.time()
+
+    # 1) Dimensiones chicas en memoria
+    groups = load_code_index(oitb_path, "ItmsGrpCod", "ItmsGrpNam")
+    sellers = load_code_index(oslp_path, "SlpCode", "SlpName")
+
+    # Fila intermedia (posiciones fijas):
+    # 0 DocEntry, 1 DocNum, 2 DocDate, 3 LineNum, 4 CardCode, 5 SlpCode, 6 ItemCode,
+    # 7 Dscription, 8 Quantity, 9 Price, 10 LineTotal, 11 ItemName, 12 ItmsGrpCod,
+    # 13 CardName, 14 LicTradNum
+    def _doc_key(cols):
+        i = cols["DocEntry"]
+        return lambda r: _int_key(r[i])
+
+    # 2) INV1 ⋈ OINV por DocEntry
+    lc, lines = sorted_csv_rows(inv1_path, _doc_key, chunk_rows)
+    hc, heads = sorted_csv_rows(oinv_path, _doc_key, chunk_rows)
+    l_idx = [lc[c] for c in ("DocEntry", "LineNum", "ItemCode", "Dscription",
+                             "Quantity", "Price", "LineTotal")]
+    h_idx = [hc[c] for c in ("DocEntry", "DocNum", "DocDate", "CardCode", "SlpCode")]
+    l_de, h_de = l_idx[0], h_idx[0]
+    no_head = [""] * (max(h_idx) + 1)
+
+    def _stage_docs():
+        for l, h in merge_join(lines, lambda r: _int_key(r[l_de]),
+                               heads, lambda r: _int_key(r[h_de])):
+            h = h or no_head
+            de, ln, item, dsc, qty, price, total = (l[i] for i in l_idx)
+            _, num, ddate, card, slp = (h[i] for i in h_idx)
+            yield [de, num, ddate, ln, card, slp, item, dsc, qty, price, total]
+
+    # 3) ⋈ OITM por ItemCode
+    ic, items = sorted_csv_rows(oitm_path, lambda c: (lambda r, i=c["ItemCode"]: r[i]), chunk_rows)
+    i_code, i_name, i_grp = ic["ItemCode"], ic["ItemName"], ic["ItmsGrpCod"]
+
+    def _stage_items():
+        by_item = external_sort(_stage_docs(), lambda r: r[6], chunk_rows)
+        for f, it in merge_join(by_item, lambda r: r[6], items, lambda r: r[i_code]):
+            if it:
+                f += (it[i_name], it[i_grp])
+            else:
+                f += ("", "")
+            yield f
+
+    # 4) ⋈ OCRD por CardCode
+    cc, partners = sorted_csv_rows(ocrd_path, lambda c: (lambda r, i=c["CardCode"]: r[i]), chunk_rows)
+    c_code, c_name, c_tax = cc["CardCode"], cc["CardName"], cc["LicTradNum"]
+
+    def _stage_partners():
+        by_card = external_sort(_stage_items(), lambda r: r[4], chunk_rows)
+        for f, bp in merge_join(by_card, lambda r: r[4], partners, lambda r: r[c_code]):
+            if bp:
+                f += (bp[c_name], bp[c_tax])
+            else:
+                f += ("", "")
+            yield f
+
+    facts = _stage_partners()
+    if order_by_document:
+        facts = external_sort(facts, lambda r: (_int_key(r[0]), _int_key(r[3])), chunk_rows)
+
+    # 5) Escritura final con OITB / OSLP desde los índices hash
+    written = 0
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with export_csv(out_path, SALES_FACT_HEADER, table="SALES_FACT", watermark="DocDate") as w:
+        for r in facts:
+            w.writerow([
+                r[0], r[1], r[2], r[3],
+                r[4], r[13], r[14],
+                r[5], sellers.get(r[5], ""),
+                r[6], r[7], r[11], r[12], groups.get(r[12], ""),
+                r[8], r[9], r[10],
+            ])
+            written += 1
+
+            if written % 100_000 == 0:
+                print(f"  -> {written} filas de hechos en {time.time()-t0:.1f}s")
+
+    print(f"✅ SALES_FACT: {written} filas -> {out_path} ({time.time()-t0:.1f}s)")
+    return written
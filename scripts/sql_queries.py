@@ -0,0 +1,249 @@
+SQL_QUERIES = {}
+_SQL_PUBLISHED = set()
+_SQL_PUBLISH_LOCK = threading.Lock()
+
+def register_sql_query(code, sql, name=None, columns=None):
+    """
+    Registra (localmente) una consulta SQL con nombre para ejecutarla en el
+    Service Layer vía /SQLQueries.
+
+    Los parámetros se escriben en el SQL como `:Nombre` y se pasan al ejecutar
+    (run_sql_query(..., params={"Nombre": valor})).
+
+    Parameters
+    ----------
+    code : str
+        SqlCode (clave en SAP, máx. 20 caracteres).
+    sql : str
+        Texto SQL (sólo SELECT; las tablas deben estar permitidas en b1s_sqltable.conf).
+    name : str, optional
+        SqlName descriptivo. Por defecto igual a `code`.
+    columns : list[str], optional
+        Columnas a exportar, en orden. Por defecto las claves de la primera fila.
+
+    Returns
+    -------
+    dict
+        Definición registrada.
+    """
+    SQL_QUERIES[code] = {"code": code, "name": name or code, "sql": " ".join(sql.split()),
+                         "columns": columns}
+    return SQL_QUERIES[code]
+
+register_sql_query(
+    "sl_stock_totales",
+    """
+    SELECT T0."ItemCode", SUM(T1."OnHand") AS "InStockTotal"
+    FROM OITM T0 INNER JOIN OITW T1 ON T1."ItemCode" = T0."ItemCode"
+    WHERE T0."InvntItem" = 'Y' AND T1."OnHand" > 0
+    GROUP BY T0."ItemCode"
+    ORDER BY T0."ItemCode"
+    """,
+    name="Stock total por artículo",
+    columns=["ItemCode", "InStockTotal"],
+)
+
+register_sql_query(
+    "sl_stock_totales_whs",
+    """
+    SELECT T0."ItemCode", SUM(T1."OnHand") AS "InStockTotal"
+    FROM OITM T0 INNER JOIN OITW T1 ON T1."ItemCode" = T0."ItemCode"
+    WHERE T0."InvntItem" = 'Y' AND T1."OnHand" > 0 AND T1."WhsCode" = :WhsCode
+    GROUP BY T0."ItemCode"
+    ORDER BY T0."ItemCode"
+    """,
+    name="Stock total por artículo en una bodega",
+    columns=["ItemCode", "InStockTotal"],
+)
+
+register_sql_query(
+    "sl_inv1_enriched",
+    """
+    SELECT T0."DocEntry", T0."DocNum", T0."DocDate", T1."LineNum", T0."CardCode",
+           T0."SlpCode", T2."SlpName", T1."ItemCode", T1."Dscription",
+           T3."ItmsGrpCod", T4."ItmsGrpNam", T1."Quantity", T1."Price", T1."LineTotal"
+    FROM OINV T0
+    INNER JOIN INV1 T1 ON T1."DocEntry" = T0."DocEntry"
+    INNER JOIN OITM T3 ON T3."ItemCode" = T1."ItemCode"
+    LEFT JOIN OITB T4 ON T4."ItmsGrpCod" = T3."ItmsGrpCod"
+    LEFT JOIN OSLP T2 ON T2."SlpCode" = T0."SlpCode"
+    WHERE T0."DocDate" >= :Desde AND T0."DocDate" < :Hasta
+    ORDER BY T0."DocEntry", T1."LineNum"
+    """,
+    name="Líneas de factura con grupo y vendedor",
+    columns=["DocEntry", "DocNum", "DocDate", "LineNum", "CardCode", "SlpCode", "SlpName",
+             "ItemCode", "Dscription", "ItmsGrpCod", "ItmsGrpNam", "Quantity", "Price", "LineTotal"],
+)
+
+def publish_sql_query(session, code):
+    """
+    Crea o actualiza en el Service Layer la consulta registrada `code`.
+
+    - GET /SQLQueries('code') con req_get (reintentos 429/5xx): si no existe (404)
+      se crea con POST /SQLQueries.
+    - Si existe con otro SqlText, se actualiza con PATCH.
+    Se hace una sola vez por proceso y consulta: los hilos que llegan a la vez
+    esperan al primero, así no se repite el POST (error de clave duplicada).
+
+    Parameters
+    ----------
+    session : requests.Session
+        Sesión autenticada.
+    code : str
+        SqlCode registrado con register_sql_query.
+    """
+    if code in _SQL_PUBLISHED:
+        return
+    q = SQL_QUERIES[code]
+    url = f"{BASE}/SQLQueries('{quote(code, safe='')}')"
+    body = {"SqlCode": q["code"], "SqlName": q["name"], "SqlText": q["sql"]}
+
+    with _SQL_PUBLISH_LOCK:
+        if code in _SQL_PUBLISHED:
+            return
+        try:
+            current = req_get(session, url, timeout=60).json()
+        except HTTPError as e:
+            if e.response is None or e.response.status_code != 404:
+                raise
+            current = None
+
+        if current is None:
+            r = session.post(f"{BASE}/SQLQueries", json=body, timeout=60, verify=VERIFY)
+            r.raise_for_status()
+            print(f"✅ SQLQueries: creada {code}")
+        elif " ".join((current.get("SqlText") or "").split()) != q["sql"]:
+            r = session.patch(url, json={"SqlName": q["name"], "SqlText": q["sql"]}, timeout=60, verify=VERIFY)
+            r.raise_for_status()
+            print(f"✅ SQLQueries: actualizada {code}")
+        _SQL_PUBLISHED.add(code)
+
+def _sql_param_literal(value):
+    """Formatea un parámetro de SQLQueries: textos y fechas entre comillas, números tal cual."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    if isinstance(value, date):
+        value = value.isoformat()
+    return "'" + str(value).replace("'", "''") + "'"
+
+def run_sql_query(session, code, params=None, pagesize=None):
+    """
+    Ejecuta una consulta registrada en el servidor y entrega sus filas, página a página.
+
+    GET /SQLQueries('code')/List?Param='valor' con req_get (reintentos 429/5xx),
+    parseo según SL_PARSE_MODE y seguimiento de odata.nextLink.
+
+    Parameters
+    ----------
+    session : requests.Session
+        Sesión autenticada.
+    code : str
+        SqlCode registrado.
+    params : dict, optional
+        Valores de los parámetros `:Nombre` del SQL.
+    pagesize : int, optional
+        odata.maxpagesize. Por defecto el ajustado para "SQLQueries('code')" o PAGESIZE.
+
+    Yields
+    ------
+    dict
+        Fila del resultado.
+    """
+    publish_sql_query(session, code)
+    pagesize = pagesize or tuned_settings(None, f"SQLQueries('{code}')")["pagesize"]
+    headers = {"Prefer": f"odata.maxpagesize={pagesize}"}
+    args = [f"{k}={quote(_sql_param_literal(v), safe='')}" for k, v in (params or {}).items()]
+    url = f"{BASE}/SQLQueries('{quote(code, safe='')}')/List"
+    if args:
+        url += "?" + "&".join(args)
+
+    while url:
+        meta = {}
+        yield from iter_page_rows(session, url, meta, headers=headers)
+        url = next_link_url(meta)
+        if url:
+            # Algunas versiones no repiten los parámetros en el nextLink
+            missing = [a for a in args if a.split("=", 1)[0] + "=" not in url]
+            if missing:
+                url += ("&" if "?" in url else "?") + "&".join(missing)
+
+def _chain_first(first, rows):
+    """Vuelve a anteponer la primera fila (ya leída para obtener las columnas)."""
+    if first is not None:
+        yield first
+    yield from rows
+
+def export_sql_query_csv(session, code, out_path, params=None, columns=None, table=None,
+                         formats=None, expected=None):
+    """
+    Ejecuta una consulta registrada y escribe el resultado en CSV con manifiesto
+    (export_csv), en streaming.
+
+    Parameters
+    ----------
+    session : requests.Session
+        Sesión autenticada.
+    code : str
+        SqlCode registrado.
+    out_path : str
+        Ruta del CSV.
+    params : dict, optional
+        Parámetros de la consulta.
+    columns : list[str], optional
+        Columnas a escribir. Por defecto las registradas con la consulta.
+    table : str, optional
+        Nombre lógico para el manifiesto. Por defecto `code`.
+    formats : dict, optional
+        {columna: función} para dar formato a valores (ej. decimales).
+    expected : int, optional
+        Filas esperadas, para el control del manifiesto.
+
+    Returns
+    -------
+    int
+        Filas escritas.
+    """
+    columns = columns or SQL_QUERIES[code]["columns"]
+    formats = formats or {}
+    rows = run_sql_query(session, code, params=params)
+    t0 = time.time()
+
+    if columns is None:
+        first = next(rows, None)
+        columns = list(first) if first else []
+        rows = _chain_first(first, rows)
+
+    getters = [(c, formats.get(c)) for c in columns]
+    with export_csv(out_path, columns, table=table or code, expected=expected) as w:
+        for r in rows:
+            w.writerow([fmt(r.get(c)) if fmt else r.get(c, "") for c, fmt in getters])
+
+    print(f"✅ {table or code} (SQLQueries): {w.rows} filas -> {out_path} "
+          f"({w.bytes:,} bytes, {time.time()-t0:.1f}s)")
+    return w.rows
+
+def export_stock_totals_sql(session, out_path, warehouse=None):
+    """
+    Genera sl_stock_totales.csv (ItemCode, InStockTotal) con la suma hecha en el
+    servidor (OITM + OITW agrupado), en lugar de descargar Items con
+    ItemWarehouseInfoCollection y sumar en el cliente.
+
+    Mismo layout y formato (4 decimales) que el main de stock_per_warehouse.py.
+
+    Parameters
+    ----------
+    session : requests.Session
+        Sesión autenticada.
+    out_path : str
+        Ruta del CSV (ej. OUT_TOTAL).
+    warehouse : str, optional
+        Sólo esa bodega (equivalente a WAREHOUSE_FILTER).
+
+    Returns
+    -------
+    int
+        Artículos escritos.
+    """
+    code, params = ("sl_stock_totales_whs", {"WhsCode": warehouse}) if warehouse else ("sl_stock_totales", None)
+    return export_sql_query_csv(session, code, out_path, params=params, table="STOCK_TOTAL",
+                                formats={"InStockTotal": lambda v: f"{safe_float(v):.4f}"})
@@ -19,10 +19,51 @@ def get_page(endpoint, params=None):
         endpoint = endpoint.split("/b1s/v1/")[-1]
 
     url = f"{BASE_URL}/{endpoint.lstrip('/')}"
-    r = session.get(url, params=params, timeout=TIMEOUT_S, verify=VERIFY_SSL)
+    r = session.get(url, params=params, timeout=TIMEOUT_S, verify=VERIFY)
     r.raise_for_status()
     return r.json()
 
+def iter_page(endpoint, params=None, meta=None):
+    """
+    Variante de get_page que entrega los ítems de la página uno a uno.
+
+    Con SL_PARSE_MODE=stream la respuesta se parsea de forma incremental
+    (iter_json_value), así páginas con ItemWarehouseInfoCollection de decenas de
+    bodegas por ítem no se cargan completas en memoria.
+
+    Parameters
+    ----------
+    endpoint : str
+        Ruta relativa (ej. "Items") o un nextLink completo.
+    params : dict, optional
+        Parámetros de query adicionales para la llamada inicial.
+    meta : dict, optional
+        Recibe las claves de primer nivel de la página (ej. odata.nextLink).
+
+    Yields
+    ------
+    dict
+        Cada registro de "value".
+    """
+    if PARSE_MODE != "stream":
+        data = get_page(endpoint, params=params)
+        items = data.pop("value", [])
+        if meta is not None:
+            meta.update(data)
+        yield from items
+        return
+
+    if endpoint.startswith("http"):
+        endpoint = endpoint.split("/b1s/v1/")[-1]
+
+    url = f"{BASE_URL}/{endpoint.lstrip('/')}"
+    r = session.get(url, params=params, timeout=TIMEOUT_S, verify=VERIFY, stream=True)
+    try:
+        r.raise_for_status()
+        yield from iter_json_value(r.iter_content(chunk_size=STREAM_CHUNK), meta)
+    finally:
+        r.close()
+
 def safe_float(x, default=0.0):
     """
     Convierte un valor arbitrario a float de forma segura.
@@ -65,85 +106,90 @@ def main():
            - Acumula totales por ItemCode en sl_stock_totales.csv
       4) Imprime progreso cada N ítems procesados.
 
+    Con --profile (o --profile=stock) la extracción se perfila como etapa "stock"
+    (ver profiling.py).
+
     Utiliza las constantes:
       OUT_BODEGA : nombre del CSV por bodega.
       OUT_TOTAL  : nombre del CSV de totales.
+      LOOKUP_STORE : si está definido (SL_LOOKUP_STORE), se publica el stock en el
+                     store SQLite de consulta del POS.
 
     Returns
     -------
     None
         (Efecto colateral: genera los archivos CSV mencionados).
     """
-    # 1) Login
-    sl_login()
-
-    # 2) Archivos de salida
-    fb = open(OUT_BODEGA, "w", newline="", encoding="utf-8")
-    ft = open(OUT_TOTAL, "w", newline="", encoding="utf-8")
-    wb = csv.writer(fb)
-    wt = csv.writer(ft)
-
-    wb.writerow(["ItemCode", "Warehouse", "InStock"])
-    wt.writerow(["ItemCode", "InStockTotal"])
-
-    totales = {}
-    count = 0
-    escritos = 0
-
-    endpoint = "Items"
-    params = {
-        "$select": "ItemCode,ItemName,InventoryItem,QuantityOnStock,ItemWarehouseInfoCollection",
-        "$filter": "InventoryItem eq 'tYES' and QuantityOnStock gt 0",
-    }
-
-    while endpoint:
-        data = get_page(endpoint, params=params)
-        endpoint, params = None, None  # params sólo se usan en la primera página
-
-        items = data.get("value", [])
-        for it in items:
-            code = (it.get("ItemCode") or "").strip()
-            iwc = it.get("ItemWarehouseInfoCollection") or []
-
-            if not iwc:
-                continue
-
-            item_total = 0.0
-            for row in iwc:
-                whs = (row.get("WarehouseCode") or "").strip()
-                stock = safe_float(row.get("InStock"))
-
-                if WAREHOUSE_FILTER and whs != WAREHOUSE_FILTER:
-                    continue
-                if stock <= 0:
+    # 1) Login (get_page / iter_page usan la sesión global)
+    global session
+    session = sl_login()
+
+    # 2) Archivos de salida (con entrada en el manifiesto al cerrar)
+    with profile_stage("stock", WAREHOUSE_FILTER or "Items"), \
+            export_csv(OUT_BODEGA, ["ItemCode", "Warehouse", "InStock"], table="STOCK_BODEGA", stage=None) as wb, \
+            export_csv(OUT_TOTAL, ["ItemCode", "InStockTotal"], table="STOCK_TOTAL", stage=None) as wt:
+        totales = {}
+        count = 0
+        escritos = 0
+
+        endpoint = "Items"
+        params = {
+            "$select": "ItemCode,ItemName,InventoryItem,QuantityOnStock,ItemWarehouseInfoCollection",
+            "$filter": "InventoryItem eq 'tYES' and QuantityOnStock gt 0",
+        }
+
+        while endpoint:
+            meta = {}
+            page = iter_page(endpoint, params=params, meta=meta)
+            endpoint, params = None, None  # params sólo se usan en la primera página
+
+            for it in page:
+                code = (it.get("ItemCode") or "").strip()
+                iwc = it.get("ItemWarehouseInfoCollection") or []
+
+                if not iwc:
                     continue
 
-                wb.writerow([code, whs, f"{stock:.4f}"])
-                escritos += 1
-                item_total += stock
+                item_total = 0.0
+                for row in iwc:
+                    whs = (row.get("WarehouseCode") or "").strip()
+                    stock = safe_float(row.get("InStock"))
 
-            if item_total > 0:
-                totales[code] = totales.get(code, 0.0) + item_total
+                    if WAREHOUSE_FILTER and whs != WAREHOUSE_FILTER:
+                        continue
+                    if stock <= 0:
+                        continue
 
-            count += 1
-            if count % 200 == 0:
-                print(f"- Procesados {count} ítems... (filas CSV por bodega: {escritos})")
-                time.sleep(0.05)
+                    wb.writerow([code, whs, f"{stock:.4f}"])
+                    escritos += 1
+                    item_total += stock
 
-        nxt = data.get("odata.nextLink")
-        if nxt:
-            endpoint = nxt
-        else:
-            break
+                if item_total > 0:
+                    totales[code] = totales.get(code, 0.0) + item_total
 
-    # 4) Totales
-    for code, total in totales.items():
-        wt.writerow([code, f"{total:.4f}"])
+                count += 1
+                if count % 200 == 0:
+                    print(f"- Procesados {count} ítems... (filas CSV por bodega: {escritos})")
+                    time.sleep(0.05)
 
-    fb.close()
-    ft.close()
+            nxt = meta.get("odata.nextLink")
+            if nxt:
+                endpoint = nxt
+            else:
+                break
+
+        # 4) Totales
+        for code, total in totales.items():
+            wt.writerow([code, f"{total:.4f}"])
 
     print(f"OK. CSVs generados: {OUT_BODEGA} y {OUT_TOTAL}")
+    if LOOKUP_STORE:
+        update_lookup_store(LOOKUP_STORE, stock_path=OUT_BODEGA)
+    rss = peak_rss_mb()
+    if rss is not None:
+        print(f"Pico de memoria (RSS): {rss:.1f} MB (SL_PARSE_MODE={PARSE_MODE})")
     if WAREHOUSE_FILTER:
         print(f"(Filtrado por bodega {WAREHOUSE_FILTER})")
-
+    print_profile_report()
+    print_cache_stats()
+    print_transport_stats()
@@ -0,0 +1,162 @@
+def traffic_key(url):
+    """
+    Clave de una petición en el archivo de tráfico: ruta + query, sin esquema ni
+    host, para poder reproducir una captura contra otro BASE.
+    """
+    sp = urlsplit(url)
+    return sp.path + ("?" + sp.query if sp.query else "")
+
+class TrafficArchive:
+    """
+    Archivo append-only de respuestas del Service Layer.
+
+    Dos archivos en `folder`:
+      traffic.bin  cuerpos comprimidos con zlib, uno detrás de otro
+      traffic.idx  una línea JSON por respuesta: clave (URL), offset, largo,
+                   status y cabeceras básicas
+
+    Nunca se reescribe nada: una nueva captura de la misma URL se agrega al final.
+    En la reproducción, las respuestas repetidas de una misma URL se entregan en el
+    orden en que se capturaron (después se repite la última).
+
+    Parameters
+    ----------
+    folder : str
+        Carpeta del archivo (TRAFFIC_DIR).
+    mode : str
+        "capture" (agregar) o "replay" (sólo lectura).
+    level : int, optional
+        Nivel de compresión zlib.
+    """
+
+    KEEP_HEADERS = ("Content-Type", "ETag", "Last-Modified", "OData-Version")
+
+    def __init__(self, folder, mode, level=6):
+        self.folder = folder
+        self.mode = mode
+        self.level = level
+        self.bin_path = os.path.join(folder, "traffic.bin")
+        self.idx_path = os.path.join(folder, "traffic.idx")
+        self.index = {}
+        self._cursor = {}
+        self._lock = threading.Lock()
+        self.stats = {"recorded": 0, "replayed": 0, "missing": 0, "raw_bytes": 0, "stored_bytes": 0}
+
+        os.makedirs(folder, exist_ok=True)
+        if os.path.exists(self.idx_path):
+            with open(self.idx_path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        e = json.loads(line)
+                        self.index.setdefault(e["key"], []).append(e)
+
+        if mode == "capture":
+            self._bin = open(self.bin_path, "ab")
+            self._idx = open(self.idx_path, "a", encoding="utf-8")
+        else:
+            self._bin = open(self.bin_path, "rb") if os.path.exists(self.bin_path) else None
+            self._idx = None
+
+    def record(self, key, status, headers, body):
+        """Agrega una respuesta al final del archivo."""
+        data = zlib.compress(body, self.level)
+        entry = {
+            "key": key,
+            "status": status,
+            "headers": {h: headers[h] for h in self.KEEP_HEADERS if h in headers},
+            "length": len(data),
+            "raw_length": len(body),
+            "t": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        with self._lock:
+            self._bin.seek(0, os.SEEK_END)
+            entry["offset"] = self._bin.tell()
+            self._bin.write(data)
+            self._bin.flush()
+            # El índice se escribe después del cuerpo: una captura cortada no deja entradas rotas
+            self._idx.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self._idx.flush()
+            self.index.setdefault(key, []).append(entry)
+            self.stats["recorded"] += 1
+            self.stats["raw_bytes"] += len(body)
+            self.stats["stored_bytes"] += len(data)
+
+    def lookup(self, key):
+        """
+        Devuelve (status, headers, body) de la siguiente captura de `key`, o None.
+        """
+        with self._lock:
+            entries = self.index.get(key)
+            if not entries or self._bin is None:
+                self.stats["missing"] += 1
+                return None
+            i = self._cursor.get(key, 0)
+            e = entries[min(i, len(entries) - 1)]
+            self._cursor[key] = i + 1
+            self._bin.seek(e["offset"])
+            data = self._bin.read(e["length"])
+            self.stats["replayed"] += 1
+        return e["status"], e["headers"], zlib.decompress(data)
+
+    def close(self):
+        for f in (self._bin, self._idx):
+            if f is not None:
+                f.close()
+
+def start_traffic(mode, folder=None):
+    """
+    Activa la captura o la reproducción del tráfico del Service Layer para las
+    sesiones creadas desde ahora con make_session (login, sl_login, clones).
+
+    Parameters
+    ----------
+    mode : str
+        "capture": las respuestas GET reales se guardan en el archivo.
+        "replay": las respuestas se leen del archivo, sin tocar la red.
+    folder : str, optional
+        Carpeta del archivo. Por defecto TRAFFIC_DIR (SL_TRAFFIC_DIR).
+
+    Returns
+    -------
+    TrafficArchive
+    """
+    global TRAFFIC
+    stop_traffic()
+    TRAFFIC = TrafficArchive(folder or TRAFFIC_DIR, mode)
+    print(f"Tráfico SL en modo {mode}: {TRAFFIC.folder} ({len(TRAFFIC.index)} URLs en el archivo)")
+    return TRAFFIC
+
+def stop_traffic():
+    """Cierra el archivo de tráfico activo y vuelve al modo normal."""
+    global TRAFFIC
+    if TRAFFIC is not None:
+        print_traffic_stats()
+        TRAFFIC.close()
+    TRAFFIC = None
+
+def print_traffic_stats():
+    """Imprime respuestas capturadas/reproducidas y la compresión del archivo."""
+    if TRAFFIC is None:
+        return
+    st = TRAFFIC.stats
+    if TRAFFIC.mode == "capture":
+        ratio = st["raw_bytes"] / st["stored_bytes"] if st["stored_bytes"] else 0
+        print(f"Tráfico capturado: {st['recorded']} respuestas, {st['raw_bytes']:,} bytes -> "
+              f"{st['stored_bytes']:,} comprimidos ({ratio:.1f}x)")
+    else:
+        print(f"Tráfico reproducido: {st['replayed']} respuestas, {st['missing']} URLs sin captura")
+
+def _replay_response(request, status, headers, body):
+    """Arma un requests.Response a partir de una respuesta archivada."""
+    r = requests.Response()
+    r.status_code = status
+    r.headers = requests.structures.CaseInsensitiveDict(headers)
+    r._content = body
+    r._content_consumed = True
+    r.raw = io.BytesIO(body)
+    r.url = request.url
+    r.request = request
+    r.reason = "Replay"
+    r.encoding = requests.utils.get_encoding_from_headers(r.headers)
+    r.elapsed = timedelta(0)
+    return r
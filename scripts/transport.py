@@ -0,0 +1,178 @@
+# Keep-alive TCP: detecta conexiones muertas del pool (firewalls que cortan sesiones ociosas al puerto 50000)
+_KEEPALIVE_OPTS = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+if hasattr(socket, "TCP_KEEPIDLE"):
+    _KEEPALIVE_OPTS += [(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 30),
+                        (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 10)]
+
+TRANSPORT_STATS = {"requests": 0, "connections": 0, "compressed": 0, "wire_bytes": 0, "body_bytes": 0}
+_TRANSPORT_LOCK = threading.Lock()
+
+def _count(name, n=1):
+    with _TRANSPORT_LOCK:
+        TRANSPORT_STATS[name] += n
+
+class _CountingHTTPPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _count("connections")
+        return super()._new_conn()
+
+class _CountingHTTPSPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _count("connections")
+        return super()._new_conn()
+
+def _track_response(r):
+    """
+    Cuenta una respuesta de red: bytes recibidos por el socket (comprimidos) y
+    bytes del cuerpo ya descomprimido, a medida que requests los consume.
+    """
+    _count("requests")
+    if r.headers.get("Content-Encoding", "").lower() in ("gzip", "deflate"):
+        _count("compressed")
+    raw = r.raw
+    seen = [0]
+    release_conn, stream = raw.release_conn, raw.stream
+
+    def _release_conn():
+        n = raw.tell()
+        if n > seen[0]:
+            _count("wire_bytes", n - seen[0])
+            seen[0] = n
+        release_conn()
+
+    def _stream(*args, **kwargs):
+        for chunk in stream(*args, **kwargs):
+            _count("body_bytes", len(chunk))
+            yield chunk
+
+    raw.release_conn = _release_conn
+    raw.stream = _stream
+
+class SLAdapter(HTTPAdapter):
+    """
+    Adaptador HTTP común a todas las sesiones del Service Layer (ver make_session).
+
+    Es el punto único por donde pasan login, sl_login, req_get, get_page y los
+    clones del hedging, así que concentra lo que aplica a todo el tráfico:
+
+      - Pool: `pool_size` conexiones por host (POOL_SIZE, SL_POOL_SIZE); se
+        agranda con size_session_pool según la concurrencia de cada exportador.
+        Los sockets usan keep-alive TCP.
+      - Métricas: conexiones abiertas, respuestas comprimidas y bytes en la red
+        vs. descomprimidos (TRANSPORT_STATS, print_transport_stats).
+      - Captura: con TRAFFIC en modo "capture", cada GET real se guarda en el
+        archivo de tráfico (TrafficArchive).
+      - Reproducción: con TRAFFIC en modo "replay", los GET se responden desde el
+        archivo sin abrir conexiones; los POST (Login) devuelven 200 vacío.
+      - Cache: con RESPONSE_CACHE activo (y sin captura/reproducción), los GET de
+        entidades de CACHE_TTLS pasan por cached_send.
+    """
+
+    def __init__(self, pool_size=None, **kwargs):
+        super().__init__(pool_connections=4, pool_maxsize=pool_size or POOL_SIZE, **kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        pool_kwargs.setdefault("socket_options", HTTPConnection.default_socket_options + _KEEPALIVE_OPTS)
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _CountingHTTPPool, "https": _CountingHTTPSPool}
+
+    def resize(self, maxsize):
+        """
+        Agranda el pool a `maxsize` conexiones por host (nunca lo achica).
+
+        Llama a poolmanager.clear(), que cierra las conexiones abiertas: usar sólo
+        antes de que otros hilos empiecen a usar la sesión.
+        """
+        if maxsize > self._pool_maxsize:
+            self.poolmanager.clear()
+            self.init_poolmanager(self._pool_connections, maxsize, block=self._pool_block)
+
+    def _send_network(self, request, **kwargs):
+        r = super().send(request, **kwargs)
+        _track_response(r)
+        if TRAFFIC is not None and TRAFFIC.mode == "capture" and request.method == "GET":
+            # Lee el cuerpo completo (ya descomprimido) aunque la llamada sea stream=True;
+            # iter_content sigue funcionando sobre r.content
+            TRAFFIC.record(traffic_key(request.url), r.status_code, r.headers, r.content)
+        return r
+
+    def send(self, request, **kwargs):
+        if TRAFFIC is not None and TRAFFIC.mode == "replay":
+            if request.method != "GET":
+                return _replay_response(request, 200, {"Content-Type": "application/json"}, b"{}")
+            key = traffic_key(request.url)
+            found = TRAFFIC.lookup(key)
+            if found is None:
+                raise requests.ConnectionError(f"[replay] URL no capturada: {key}", request=request)
+            return _replay_response(request, *found)
+
+        if RESPONSE_CACHE is not None and TRAFFIC is None and request.method == "GET":
+            return cached_send(self._send_network, request, **kwargs)
+        return self._send_network(request, **kwargs)
+
+def make_session(pool_size=None):
+    """
+    Crea una requests.Session con SLAdapter montado para http:// y https://.
+
+    Todas las sesiones del Service Layer (login, sl_login, clones del hedging) se
+    crean con esta función. Con SL_TRAFFIC=capture|replay, la primera llamada
+    activa el archivo de tráfico (start_traffic); con SL_CACHE=true, el cache de
+    respuestas (start_response_cache).
+
+    La sesión queda con la verificación TLS de VERIFY (VERIFY_SSL / SL_CA_BUNDLE)
+    y pide respuestas comprimidas (ACCEPT_ENCODING).
+
+    Parameters
+    ----------
+    pool_size : int, optional
+        Conexiones por host. Por defecto POOL_SIZE.
+
+    Returns
+    -------
+    requests.Session
+    """
+    if TRAFFIC is None and TRAFFIC_MODE in ("capture", "replay"):
+        start_traffic(TRAFFIC_MODE)
+    if RESPONSE_CACHE is None and CACHE_ENABLED:
+        start_response_cache()
+    s = requests.Session()
+    s.verify = VERIFY
+    s.headers.update({"Accept-Encoding": ACCEPT_ENCODING, "Connection": "keep-alive"})
+    adapter = SLAdapter(pool_size)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+def size_session_pool(session, workers):
+    """
+    Ajusta el pool de conexiones de `session` a la concurrencia que se va a usar
+    (hilos que comparten la sesión), para no abrir y descartar conexiones con
+    "Connection pool is full".
+
+    Llamar antes de arrancar los hilos (ver SLAdapter.resize): agrandar el pool
+    cierra las conexiones que estén en uso. Con hedging activo también agranda el
+    pool de hilos de las primarias (Hedger.resize).
+
+    Parameters
+    ----------
+    session : requests.Session
+        Sesión creada con make_session.
+    workers : int
+        Hilos concurrentes.
+    """
+    for adapter in set(session.adapters.values()):
+        if isinstance(adapter, SLAdapter):
+            adapter.resize(workers)
+    if HEDGER is not None:
+        HEDGER.resize(workers)
+
+def print_transport_stats():
+    """Imprime reutilización de conexiones y bytes en la red vs. descomprimidos."""
+    st = dict(TRANSPORT_STATS)
+    if not st["requests"]:
+        return
+    reuse = 100 * (1 - st["connections"] / st["requests"])
+    ratio = st["body_bytes"] / st["wire_bytes"] if st["wire_bytes"] else 0.0
+    print(f"Transporte SL: {st['requests']} respuestas con {st['connections']} conexiones "
+          f"({reuse:.1f}% reutilizadas) | {st['compressed']} comprimidas | "
+          f"{st['wire_bytes']:,} bytes en la red -> {st['body_bytes']:,} descomprimidos ({ratio:.1f}x)")